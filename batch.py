@@ -0,0 +1,116 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from board import loadBoard
+from cache import SolveCache
+from dice import defaultCharacters, loadCharacters
+import solver
+
+#the boards and reachability indexes each worker process has already loaded, by path
+workerBoards = {}
+
+#returns the board in the given file along with its reachability index, parsing each file
+#only once per worker process
+def cachedBoard(path):
+    if path not in workerBoards:
+        board = loadBoard(path)
+        workerBoards[path] = (board, solver.ReachIndex(board))
+    return workerBoards[path]
+
+#returns the answer of a solution for one space and number of turns, as reported in the JSON results
+def resultFields(solution, node, turns):
+    characterInd = solution.getDice(node, turns)
+    return {'turns': turns, 'origin': node,
+            'character': solution.lineup[characterInd].name if characterInd is not None else None,
+            'expected': solution.getExpected(node, turns),
+            'choices': [[roll, list(choices)] for roll, choices in solution.getRollChoices(node, turns)]}
+
+#solves one board for one lineup, returning a result for each of the given numbers of turns
+#every horizon is read from a single solve of the longest one, since a solve keeps every turn
+#with a tolerance, the solve stops once it converges and the longer horizons are extrapolated
+#cacheDirectory may name a solve cache shared by every worker, to skip the solves made before
+def solveJob(path, lineup, horizons, backend=None, tolerance=None, cacheDirectory=None):
+    base = {'board': path, 'lineup': [character.name for character in lineup]}
+    try:
+        board, index = cachedBoard(path)
+        if board.origin is None:
+            raise ValueError("the board has no origin")
+        cache = SolveCache(cacheDirectory) if cacheDirectory else None
+        solution = solver.solve(board, lineup, max(horizons), index, backend, tolerance=tolerance, cache=cache)
+    except Exception as err:
+        return [dict(base, turns=turns, error=str(err)) for turns in horizons]
+
+    return [dict(base, **resultFields(solution, board.origin, turns)) for turns in horizons]
+
+#runs every board and lineup combination across a pool of processes, calling report with each
+#result as soon as its job finishes; returns the number of results that failed
+def runBatch(paths, lineups, horizons, workers=None, backend=None, report=None, tolerance=None,
+             cacheDirectory=None):
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        #jobs are queued board by board, so each worker tends to reuse the boards it already parsed
+        futures = [executor.submit(solveJob, path, lineup, horizons, backend, tolerance, cacheDirectory)
+                   for path in paths for lineup in lineups]
+        for future in as_completed(futures):
+            for result in future.result():
+                if 'error' in result:
+                    failures += 1
+                if report:
+                    report(result)
+    return failures
+
+#reads a lineup given as comma separated character names
+def parseLineup(text, charactersMap):
+    lineup = []
+    for name in text.split(','):
+        name = name.strip()
+        if name not in charactersMap:
+            raise ValueError("unknown character: " + name)
+        lineup.append(charactersMap[name])
+    return lineup
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve board files for every lineup and number of turns.")
+    parser.add_argument('boards', nargs='+', help="board files or glob patterns matching them")
+    parser.add_argument('--lineup', action='append', required=True,
+                        help="comma separated character names; may be given more than once")
+    parser.add_argument('--turns', nargs='+', type=int, required=True)
+    parser.add_argument('--characters', help="JSON file of character definitions to use instead of the defaults")
+    parser.add_argument('--workers', type=int, help="number of worker processes")
+    parser.add_argument('--backend', choices=sorted(solver.backends))
+    parser.add_argument('--tolerance', type=float,
+                        help="stop solving once no space's gain per turn changes by more than this, "
+                             "extrapolating the remaining turns")
+    parser.add_argument('--cache', metavar='DIR', help="directory of solves to reuse and add to")
+    args = parser.parse_args(argv)
+
+    characters = loadCharacters(args.characters) if args.characters else defaultCharacters()
+    charactersMap = {character.name: character for character in characters}
+    try:
+        lineups = [parseLineup(text, charactersMap) for text in args.lineup]
+    except ValueError as err:
+        parser.error(str(err))
+    if min(args.turns) < 1:
+        parser.error("the number of turns must be at least 1")
+    paths = []
+    for pattern in args.boards:
+        matches = sorted(glob.glob(pattern)) or ([pattern] if os.path.exists(pattern) else [])
+        if not matches:
+            parser.error("no board files match " + pattern)
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+
+    def report(result):
+        sys.stdout.write(json.dumps(result)+"\n")
+        sys.stdout.flush()
+
+    failures = runBatch(paths, lineups, sorted(set(args.turns)), args.workers, args.backend, report,
+                        args.tolerance, args.cache)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
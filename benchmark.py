@@ -0,0 +1,214 @@
+import argparse
+import itertools
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from board import Board
+from dice import defaultCharacters
+import solver
+
+#the version of the results format
+resultsVersion = 1
+
+#generates a straight track of spaces ending in a dead end
+def linearBoard(nodeCount, branching, rng):
+    coords = [(ind*40, 0) for ind in range(nodeCount)]
+    edges = [(ind, ind+1) for ind in range(nodeCount-1)]
+    return coords, edges
+
+#generates a single loop of spaces
+def ringBoard(nodeCount, branching, rng):
+    radius = max(nodeCount*40/(2*math.pi), 40)
+    coords = [(radius*math.sin(2*math.pi*ind/nodeCount), -radius*math.cos(2*math.pi*ind/nodeCount))
+              for ind in range(nodeCount)]
+    edges = [(ind, (ind+1)%nodeCount) for ind in range(nodeCount)]
+    return coords, edges
+
+#generates a grid of spaces leading right and down, wrapping around at the edges
+def gridBoard(nodeCount, branching, rng):
+    width = max(int(math.sqrt(nodeCount)), 2)
+    height = max(nodeCount//width, 2)
+    coords = [(col*40, row*40) for row in range(height) for col in range(width)]
+    edges = []
+    for row in range(height):
+        for col in range(width):
+            node = row*width+col
+            edges.append((node, row*width+(col+1)%width))
+            edges.append((node, ((row+1)%height)*width+col))
+    return coords, edges
+
+#generates a tree where every space leads to branching others, with the leaves leading back to the root
+def treeBoard(nodeCount, branching, rng):
+    branching = max(branching, 2)
+    depths = [0]
+    edges = []
+    for node in range(1, nodeCount):
+        parent = (node-1)//branching
+        depths.append(depths[parent]+1)
+        edges.append((parent, node))
+    rowCounts = {}
+    coords = []
+    for depth in depths:
+        coords.append((rowCounts.get(depth, 0)*40, depth*40))
+        rowCounts[depth] = rowCounts.get(depth, 0)+1
+    parents = {parent for parent, _ in edges}
+    edges.extend((node, 0) for node in range(nodeCount) if node not in parents)
+    return coords, edges
+
+#generates a Super Mario Party style board: one loop of straight paths joined by forks, where the
+#route splits into branching paths of random lengths that meet again at the next straight path
+def marioBoard(nodeCount, branching, rng):
+    branching = max(branching, 2)
+    edges = []
+    #the route around the loop, as lists of parallel paths of spaces
+    sections = []
+    node = 0
+    while node < nodeCount:
+        length = rng.randint(3, 8)
+        sections.append([list(range(node, min(node+length, nodeCount)))])
+        node += length
+        if node+branching > nodeCount:
+            break
+        paths = []
+        for _ in range(branching):
+            length = min(rng.randint(2, 6), max((nodeCount-node)//branching, 1))
+            paths.append(list(range(node, node+length)))
+            node += length
+        sections.append(paths)
+    nodeCount = max(path[-1] for section in sections for path in section)+1
+
+    coords = [None]*nodeCount
+    radius = max(nodeCount*40/(2*math.pi), 80)
+    position = 0
+    steps = sum(max(len(path) for path in section) for section in sections)
+    for section in sections:
+        for lane, path in enumerate(section):
+            laneRadius = radius+(lane-(len(section)-1)/2)*40
+            for step, pathNode in enumerate(path):
+                angle = 2*math.pi*(position+step)/steps
+                coords[pathNode] = (laneRadius*math.sin(angle), -laneRadius*math.cos(angle))
+        position += max(len(path) for path in section)
+
+    for section, nextSection in zip(sections, sections[1:]+sections[:1]):
+        for path in section:
+            edges.extend(zip(path, path[1:]))
+            for nextPath in nextSection:
+                edges.append((path[-1], nextPath[0]))
+    return coords, list(dict.fromkeys(edges))
+
+#the board generators by name
+generators = {'linear': linearBoard, 'ring': ringBoard, 'grid': gridBoard, 'tree': treeBoard,
+              'mario': marioBoard}
+
+#generates a board of the given shape from a seed, with about one space in twenty as a goal
+def genBoard(shape, nodeCount, branching, seed):
+    rng = random.Random(seed)
+    coords, edges = generators[shape](nodeCount, branching, rng)
+    goals = rng.sample(range(len(coords)), max(len(coords)//20, 1))
+    return Board(coords, edges, goals, 0)
+
+#picks a lineup of the given size from the default characters from a seed
+def genLineup(size, seed):
+    return random.Random(seed).sample(defaultCharacters(), size)
+
+#times one case, returning the fastest of the repeated solves in seconds and the peak traced memory
+#of one more solve in bytes; the memory is measured separately since tracing slows the solve down
+def runCase(board, lineup, turns, backend, repeat):
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        solver.solve(board, lineup, turns, backend=backend)
+        seconds = min(seconds, time.perf_counter()-start)
+    tracemalloc.start()
+    try:
+        solver.solve(board, lineup, turns, backend=backend)
+        _, peakBytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peakBytes
+
+#identifies a case, so that results can be matched against a baseline
+def caseKey(case):
+    return "{shape} nodes={nodes} branching={branching} turns={turns} lineup={lineup} backend={backend}" \
+        .format(**case)
+
+#runs every combination of the given parameters, returning the list of results
+#report is called with each result as it is finished
+def sweep(shapes, nodeCounts, branchings, turnCounts, lineupSizes, backendNames, repeat=3, seed=0,
+          report=None):
+    results = []
+    for shape, nodes, branching in itertools.product(shapes, nodeCounts, branchings):
+        board = genBoard(shape, nodes, branching, seed)
+        for turns, lineupSize, backend in itertools.product(turnCounts, lineupSizes, backendNames):
+            seconds, peakBytes = runCase(board, genLineup(lineupSize, seed), turns, backend, repeat)
+            result = {'shape': shape, 'nodes': nodes, 'branching': branching, 'turns': turns,
+                      'lineup': lineupSize, 'backend': backend, 'boardNodes': board.nodeCount,
+                      'boardEdges': board.edgeCount, 'seconds': seconds, 'peakBytes': peakBytes}
+            results.append(result)
+            if report:
+                report(result)
+    return results
+
+#compares results against a baseline, returning (key, measure, baseline, current) for every case that
+#got slower or used more memory than the baseline allows
+def regressions(results, baseline, tolerance=0.25, memoryTolerance=0.1):
+    baseCases = {caseKey(case): case for case in baseline['results']}
+    out = []
+    for result in results:
+        base = baseCases.get(caseKey(result))
+        if base is None:
+            continue
+        if result['seconds'] > base['seconds']*(1+tolerance):
+            out.append((caseKey(result), 'seconds', base['seconds'], result['seconds']))
+        if result['peakBytes'] > base['peakBytes']*(1+memoryTolerance):
+            out.append((caseKey(result), 'peakBytes', base['peakBytes'], result['peakBytes']))
+    return out
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the solver on generated boards.")
+    parser.add_argument('--shapes', nargs='+', default=sorted(generators), choices=sorted(generators))
+    parser.add_argument('--nodes', nargs='+', type=int, default=[100, 400])
+    parser.add_argument('--branching', nargs='+', type=int, default=[2])
+    parser.add_argument('--turns', nargs='+', type=int, default=[1, 10, 30])
+    parser.add_argument('--lineup', nargs='+', type=int, default=[1, 3, 5])
+    parser.add_argument('--backends', nargs='+', default=[name for name in sorted(solver.backends)
+                                                          if name == 'python' or solver.np is not None])
+    parser.add_argument('--repeat', type=int, default=3, help="solves per case, keeping the fastest")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="flag cases that are slower than in this JSON file")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument('--memory-tolerance', type=float, default=0.1,
+                        help="allowed growth of peak memory against the baseline, as a fraction")
+    args = parser.parse_args(argv)
+
+    def report(result):
+        print("{:<60} {:>10.4f}s {:>10.1f}KiB".format(caseKey(result), result['seconds'],
+                                                       result['peakBytes']/1024))
+        sys.stdout.flush()
+
+    results = sweep(args.shapes, args.nodes, args.branching, args.turns, args.lineup, args.backends,
+                    args.repeat, args.seed, report)
+    if args.save:
+        with open(args.save, 'w') as outFile:
+            json.dump({'version': resultsVersion, 'python': platform.python_version(),
+                       'numpy': solver.np.__version__ if solver.np is not None else None,
+                       'seed': args.seed, 'results': results}, outFile, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as baseFile:
+            baseline = json.load(baseFile)
+        found = regressions(results, baseline, args.tolerance, args.memory_tolerance)
+        for key, measure, before, after in found:
+            print("REGRESSION {} {}: {:g} -> {:g}".format(key, measure, before, after))
+        if found:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
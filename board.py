@@ -0,0 +1,175 @@
+import json
+import math
+from array import array
+
+#identifies board files, and the version of their format
+boardFormat = 'choosedice-board'
+boardFormatVersion = 1
+
+#produces the English ordinal suffix for the passed in number
+def ordinal(num):
+    mod = num%10
+    if mod == 1 and num != 11:
+        return "st"
+    if mod == 2 and num != 12:
+        return "nd"
+    if mod == 3 and num != 13:
+        return "rd"
+    return "th"
+
+#orders the neighbors of a space and gives each an English description of its direction
+#angles holds the bearing (clockwise from North) of the line to each neighbor, and fromVector
+#holds the sum of the vectors from each parent to the space, or None if the space has no parents
+#returns (index into angles, description) pairs in the order the descriptions are listed
+def orderNeighbors(angles, fromVector):
+    if len(angles) == 1:
+        return [(0, "")]
+    if fromVector is None:
+        return [(ind, str(int(angle*180/math.pi))+" degrees clockwise from North")
+                for ind, angle in enumerate(angles)]
+
+    fromDir = math.atan2(*fromVector)
+    leftNeighbors = []
+    for ind, toDir in enumerate(angles):
+        rotatedDir = (toDir-fromDir)%(2*math.pi)
+        if rotatedDir > math.pi:
+            rotatedDir -= 2*math.pi
+        leftNeighbors.append((rotatedDir, ind))
+    leftNeighbors.sort(key=lambda neigh: neigh[0])
+
+    if len(leftNeighbors) == 2:
+        return [(leftNeighbors[0][1], "left"), (leftNeighbors[1][1], "right")]
+    return [(ind, str(pos+1)+ordinal(pos+1)+" from left") for pos, (_, ind) in enumerate(leftNeighbors)]
+
+#orders the neighbors of the space at (x, y) and describes the direction of each, given the
+#coordinates of its neighbors and of its parents; returns (index into neighborCoords, description)
+#pairs in the order the descriptions are listed
+def directionLabels(x, y, neighborCoords, parentCoords):
+    angles = [math.atan2(neighborX-x, y-neighborY) for neighborX, neighborY in neighborCoords]
+    fromVector = None
+    if parentCoords:
+        fromVector = [0, 0]
+        for parentX, parentY in parentCoords:
+            fromVector[0] += x-parentX
+            fromVector[1] += parentY-y
+    return orderNeighbors(angles, fromVector)
+
+#Represents a board as a directed graph, independent of any GUI
+#the edges are stored in compressed sparse row form: the neighbors of space i are
+#targets[offsets[i]:offsets[i+1]], listed in the same order as their direction labels
+#labels may hold the direction label of each edge when they are already known, in which case the
+#edges leaving each space must be listed in label order
+class Board:
+    def __init__(self, coords, edges, goals=(), origin=None, labels=None):
+        #the number of spaces on the board
+        self.nodeCount = len(coords)
+        #the coordinates of the center of each space, with y increasing southward
+        self.xs = array('d', [x for x, _ in coords])
+        self.ys = array('d', [y for _, y in coords])
+        #whether each space is a goal
+        self.goals = bytearray(self.nodeCount)
+        for goal in goals:
+            self.goals[goal] = 1
+        #the index of the starting space, if any
+        self.origin = origin
+
+        children = [[] for _ in range(self.nodeCount)]
+        parents = [[] for _ in range(self.nodeCount)]
+        childLabels = [[] for _ in range(self.nodeCount)]
+        for ind, (source, target) in enumerate(edges):
+            children[source].append(target)
+            parents[target].append(source)
+            if labels is not None:
+                childLabels[source].append(labels[ind])
+
+        #the start of each space's neighbors in targets
+        self.offsets = array('i', [0])
+        #the neighbor at the end of each edge
+        self.targets = array('i')
+        #the bearing of each edge, clockwise from North
+        self.angles = array('d')
+        #the English description of each edge's direction, empty where there is no choice to make
+        self.labels = []
+        for node in range(self.nodeCount):
+            x = self.xs[node]
+            y = self.ys[node]
+            if labels is None:
+                ordered = directionLabels(x, y, [(self.xs[child], self.ys[child]) for child in children[node]],
+                                          [(self.xs[parent], self.ys[parent]) for parent in parents[node]])
+            else:
+                ordered = list(enumerate(childLabels[node]))
+            for ind, label in ordered:
+                child = children[node][ind]
+                self.targets.append(child)
+                self.angles.append(math.atan2(self.xs[child]-x, y-self.ys[child]))
+                self.labels.append(label)
+            self.offsets.append(len(self.targets))
+
+        #the start of each space's parents in sources
+        self.parentOffsets = array('i', [0])
+        #the parent at the start of each reversed edge
+        self.sources = array('i')
+        for node in range(self.nodeCount):
+            self.sources.extend(parents[node])
+            self.parentOffsets.append(len(self.sources))
+
+    #the number of directed edges on the board
+    @property
+    def edgeCount(self):
+        return len(self.targets)
+
+    #returns the range of edge indices leaving the given space
+    def edgeRange(self, node):
+        return range(self.offsets[node], self.offsets[node+1])
+
+    #returns the neighbors of the given space in label order
+    def neighbors(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node+1]]
+
+    #returns the parents of the given space
+    def parents(self, node):
+        return self.sources[self.parentOffsets[node]:self.parentOffsets[node+1]]
+
+    #returns the directed edges as (source, target) pairs, with each space's edges in label order
+    def edges(self):
+        return [(node, self.targets[edge]) for node in range(self.nodeCount) for edge in self.edgeRange(node)]
+
+    #produces the board in the board file format
+    def toDict(self):
+        return {'format': boardFormat, 'version': boardFormatVersion,
+                'nodes': [{'x': self.xs[node], 'y': self.ys[node], 'goal': bool(self.goals[node])}
+                          for node in range(self.nodeCount)],
+                'edges': [list(edge) for edge in self.edges()],
+                'origin': self.origin}
+
+    #reads a board from the board file format, raising a ValueError if it is not a board this version reads
+    #the direction labels are not stored, since they follow from the coordinates
+    @staticmethod
+    def fromDict(definition):
+        if definition.get('format') != boardFormat:
+            raise ValueError("not a board file")
+        if definition.get('version') != boardFormatVersion:
+            raise ValueError("unsupported board file version: " + str(definition.get('version')))
+        nodes = definition['nodes']
+        nodeCount = len(nodes)
+        edges = [(source, target) for source, target in definition['edges']]
+        for source, target in edges:
+            if not (0 <= source < nodeCount and 0 <= target < nodeCount) or source == target:
+                raise ValueError("invalid edge: " + str(source) + " to " + str(target))
+        if len(set(edges)) != len(edges):
+            raise ValueError("duplicate edges")
+        origin = definition.get('origin')
+        if origin is not None and not 0 <= origin < nodeCount:
+            raise ValueError("invalid origin: " + str(origin))
+        return Board([(node['x'], node['y']) for node in nodes], edges,
+                     [ind for ind, node in enumerate(nodes) if node.get('goal')], origin)
+
+#reads a board from a board file
+def loadBoard(path):
+    with open(path) as boardFile:
+        return Board.fromDict(json.load(boardFile))
+
+#writes a board to a board file
+def saveBoard(board, path):
+    with open(path, 'w') as boardFile:
+        json.dump(board.toDict(), boardFile, indent=1)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+import solver
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+#the largest total size of the cached tables kept by default, in bytes
+defaultCacheBytes = 1 << 30
+#how long a temporary entry may sit unfinished before it is taken to be left by a crashed writer, in seconds
+staleSeconds = 3600
+
+#returns the directory solves are cached in by default, following the XDG cache directory
+def defaultCacheDirectory():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'choosedice')
+
+#Keeps the tables of finished solves on disk, so that solving the same board with the same rolls again
+#loads them instead; an entry is found by a hash of everything its tables depend on (the spaces, the
+#order of their edges, the goals, the roll distributions, the number of turns, the tolerance and the
+#solver version), so edits or a new solver never reuse stale tables
+#tables are stored as .npy files that are memory-mapped when loaded, so only the turns and spaces that
+#are read get paged in; entries are written to a temporary directory and renamed into place, so
+#parallel writers never see half-written entries, and the least recently used entries are removed
+#once the total size goes over maxBytes
+class SolveCache:
+    def __init__(self, directory=None, maxBytes=defaultCacheBytes):
+        if np is None:
+            raise ValueError("the solve cache requires NumPy")
+        #the directory holding one subdirectory per cached solve
+        self.directory = directory if directory is not None else defaultCacheDirectory()
+        #the largest total size of the cached tables, in bytes
+        self.maxBytes = maxBytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    #returns the hash identifying the solve of a board with the given roll distributions
+    @staticmethod
+    def key(board, distributions, turns, tolerance=None):
+        definition = {'solver': solver.solverVersion, 'nodes': board.nodeCount, 'offsets': list(board.offsets),
+                      'targets': list(board.targets), 'goals': list(board.goals),
+                      'distributions': [list(dist) for dist in distributions], 'turns': turns,
+                      'tolerance': tolerance}
+        text = json.dumps(definition, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    #returns the cached Solution of the board for the given lineup and roll distributions, with its tables
+    #memory-mapped from disk, or None if it is not cached
+    def load(self, board, lineup, distributions, turns, tolerance=None):
+        path = os.path.join(self.directory, self.key(board, distributions, turns, tolerance))
+        try:
+            with open(os.path.join(path, 'meta.json')) as metaFile:
+                meta = json.load(metaFile)
+            expected = np.load(os.path.join(path, 'expected.npy'), mmap_mode='r')
+            dice = np.load(os.path.join(path, 'dice.npy'), mmap_mode='r')
+            pointers = np.load(os.path.join(path, 'pointers.npy'), mmap_mode='r')
+            gains = np.load(os.path.join(path, 'gains.npy')) if meta['steadyTurn'] is not None else None
+            #touching the entry marks it as recently used
+            os.utime(os.path.join(path, 'meta.json'))
+        except (OSError, ValueError, KeyError):
+            return None
+        solution = solver.Solution(board, lineup, distributions, expected, dice, pointers)
+        if gains is not None:
+            solution.extrapolate(meta['turns'], gains)
+        return solution
+
+    #writes the tables of a solution that kept every turn, then removes the least recently used
+    #entries if the cache grew too large; an entry that is already cached is left as it is
+    #the cache only saves time, so a solve that cannot be written (such as on a full disk) is not stored
+    def store(self, solution, tolerance=None):
+        if any(row is None for row in solution.pointers[1:]):
+            raise ValueError("only solutions that kept every turn can be cached")
+        key = self.key(solution.board, solution.distributions, solution.turns, tolerance)
+        path = os.path.join(self.directory, key)
+        if os.path.exists(path):
+            return
+        tempPath = os.path.join(self.directory, 'tmp-' + uuid.uuid4().hex)
+        try:
+            os.makedirs(tempPath)
+            self.__writeTables(solution, tempPath)
+            #fails if another process stored the same solve first, which leaves theirs in place
+            os.rename(tempPath, path)
+        except OSError:
+            return
+        finally:
+            shutil.rmtree(tempPath, ignore_errors=True)
+        self.evict()
+
+    def __writeTables(self, solution, path):
+        nodeCount = solution.board.nodeCount
+        solvedTurns = solution.solvedTurns
+        np.save(os.path.join(path, 'expected.npy'), np.array([np.asarray(row) for row in solution.expected]))
+        np.save(os.path.join(path, 'dice.npy'), np.array([np.asarray(row) for row in solution.dice]))
+        distances = max(len(dist) for dist in solution.distributions)
+        pointers = np.full((solvedTurns+1, distances, nodeCount), -1, dtype=np.int32)
+        for turns in range(1, solvedTurns+1):
+            for distance, row in enumerate(solution.pointers[turns]):
+                if row is not None:
+                    pointers[turns, distance] = row
+        #the smallest type that holds every rank, as the solver uses
+        rankType = np.dtype(solver.smallIntType(max(int(pointers.max(initial=0)), 0)))
+        np.save(os.path.join(path, 'pointers.npy'), pointers.astype(rankType))
+        if solution.gains is not None:
+            np.save(os.path.join(path, 'gains.npy'), np.asarray(solution.gains, dtype=float))
+        with open(os.path.join(path, 'meta.json'), 'w') as metaFile:
+            json.dump({'turns': solution.turns, 'steadyTurn': solution.steadyTurn, 'nodes': nodeCount}, metaFile)
+
+    #holds an exclusive lock on the cache directory, where the platform supports it
+    @contextmanager
+    def __locked(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, 'lock'), 'w') as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+    #returns the cached entries as (last used time, size in bytes, path), least recently used first
+    def entries(self):
+        out = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('tmp-') or not os.path.isdir(path):
+                continue
+            try:
+                used = os.path.getmtime(os.path.join(path, 'meta.json'))
+                size = sum(entry.stat().st_size for entry in os.scandir(path))
+            except OSError:
+                continue
+            out.append((used, size, path))
+        out.sort()
+        return out
+
+    #the total size of the cached tables, in bytes
+    @property
+    def sizeBytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    #removes the least recently used entries until the cache fits in maxBytes
+    #entries are renamed away before they are deleted, so a process loading one sees all of it or nothing,
+    #and tables it already mapped stay readable
+    def evict(self):
+        with self.__locked():
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                try:
+                    if name.startswith('tmp-') and time.time()-os.path.getmtime(path) > staleSeconds:
+                        shutil.rmtree(path, ignore_errors=True)
+                except OSError:
+                    pass
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.maxBytes:
+                    break
+                self.__remove(path)
+                total -= size
+
+    #removes every cached entry
+    def clear(self):
+        with self.__locked():
+            for _, _, path in self.entries():
+                self.__remove(path)
+
+    def __remove(self, path):
+        deadPath = os.path.join(self.directory, 'tmp-' + uuid.uuid4().hex)
+        try:
+            os.rename(path, deadPath)
+        except OSError:
+            return
+        shutil.rmtree(deadPath, ignore_errors=True)
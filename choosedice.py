@@ -1,42 +1,58 @@
 from tkinter import *
+from tkinter import filedialog
 import math
+import queue
+import sys
+from board import Board, directionLabels, loadBoard, saveBoard
+from cache import SolveCache
+from dice import defaultCharacters
+from stats import SolveStats
+import optimizer
+import solver
+
+#returns a heatmap color, from white for no goals to red for the most goals, given as a fraction of the most
+def heatColor(fraction):
+    shade = int(round(255*(1-fraction)))
+    return '#ff{:02x}{:02x}'.format(shade, shade)
 
 # Represents a line between two nodes
+# itemIds may give the IDs of a line and arrow head already drawn, such as by the script of createScript
 class Line:
-    def __init__(self, canvas, x1, y1, x2, y2):
+    def __init__(self, canvas, x1, y1, x2, y2, itemIds=None):
         # the canvas on which the line is drawn
         self.canvas = canvas
-        # the tkinter ID for the line itself
-        self.lineId = canvas.create_line(x1, y1, x2, y2)
-        # the coordinates representing the arrows on the line
-        arrowCoords = self.__genArrowCoords(x1, y1, x2, y2)
-        # the tkinter ID for the first arrow line
-        self.arrowId1 = canvas.create_line(*arrowCoords[0])
-        # the tkinter ID for the second arrow line
-        self.arrowId2 = canvas.create_line(*arrowCoords[1])
+        # the coordinates of the line, kept here so that moving an end needs no canvas lookup
+        self.coords = (x1, y1, x2, y2)
+        if itemIds is None:
+            itemIds = (canvas.create_line(x1, y1, x2, y2),
+                       canvas.create_line(*self.__genArrowCoords(x1, y1, x2, y2)))
+        # the tkinter IDs for the line itself and for the arrow head, drawn as a single bent line through
+        # the middle of the line
+        self.lineId, self.arrowId = itemIds
+
+    # returns the Tcl commands drawing a line and its arrow head on the canvas with the given path,
+    # each giving the ID of its item
+    @staticmethod
+    def createScript(canvasPath, x1, y1, x2, y2):
+        return [canvasPath + " create line " + " ".join(map(repr, coords))
+                for coords in [(x1, y1, x2, y2), tuple(Line.__genArrowCoords(x1, y1, x2, y2))]]
 
     # sets the coordinates for the line
     def setCoords(self, x1, y1, x2, y2):
+        if (x1, y1, x2, y2) == self.coords:
+            return
+        self.coords = (x1, y1, x2, y2)
         # sets the coordinates of the line in tkinter
         self.canvas.coords(self.lineId, x1, y1, x2, y2)
-        # sets the coordinates for the smaller arrow lines in tkinter
-        arrowCoords = self.__genArrowCoords(x1, y1, x2, y2)
-        self.canvas.coords(self.arrowId1, *arrowCoords[0])
-        self.canvas.coords(self.arrowId2, *arrowCoords[1])
+        # sets the coordinates for the arrow head in tkinter
+        self.canvas.coords(self.arrowId, *self.__genArrowCoords(x1, y1, x2, y2))
 
     # removes the line from tkinter
     def remove(self):
-        for id in [self.lineId, self.arrowId1, self.arrowId2]:
+        for id in [self.lineId, self.arrowId]:
             self.canvas.delete(id)
 
-    # updates the direction
-    def update(self, direction, x1, y1, x2, y2):
-        lineCoords = self.canvas.coords(self.lineId)
-        lineCoords[direction * 2] = (x1 + x2) / 2.0
-        lineCoords[direction * 2 + 1] = (y1 + y2) / 2.0
-        self.setCoords(*lineCoords)
-
-    # generates the coordinates for an arrow given a line start and end point
+    # generates the coordinates for an arrow head given a line start and end point
     @staticmethod
     def __genArrowCoords(x1, y1, x2, y2):
         midx = (x1 + x2) / 2.0
@@ -52,79 +68,91 @@ class Line:
             perpx = -vecty
             perpy = vectx
 
-            coords1 = [midx, midy, midx + perpx - vectx, midy + perpy - vecty]
-            coords2 = [midx, midy, midx - perpx - vectx, midy - perpy - vecty]
-        else:
-            coords1 = [midx, midy, midx, midy]
-            coords2 = [midx, midy, midx, midy]
-
-        return coords1, coords2
+            return [midx + perpx - vectx, midy + perpy - vecty, midx, midy,
+                    midx - perpx - vectx, midy - perpy - vecty]
+        return [midx, midy, midx, midy]
 
 #Represents a node in the graph to be searched, or a location on the board
 class Node:
     #the halfWidth of the Node when drawn on the canvas
     halfWidth = 10
     arrowLength = 5
-
-    def __init__(self, canvas, creator, x, y):
+    #the canvas tag shared by every Node, which the mouse bindings are registered on
+    tag = 'node'
+
+    #itemId may give the ID of a rectangle already drawn for the Node, such as by the script of createScript
+    def __init__(self, canvas, creator, x, y, isGoal=False, itemId=None):
+        if itemId is None:
+            itemId = canvas.create_rectangle(x - Node.halfWidth,
+                                             y - Node.halfWidth,
+                                             x + Node.halfWidth,
+                                             y + Node.halfWidth,
+                                             fill='red' if isGoal else 'blue',
+                                             activefill='purple',
+                                             tags=Node.tag)
         #the canvas id for the Node
-        self.itemId = canvas.create_rectangle(x - Node.halfWidth,
-                                              y - Node.halfWidth,
-                                              x + Node.halfWidth,
-                                              y + Node.halfWidth,
-                                              fill='blue',
-                                              activefill='purple')
+        self.itemId = itemId
+        #the center of the Node on the canvas
+        self.x = float(x)
+        self.y = float(y)
         #the canvas on which the Node is drawn
         self.canvas = canvas
         #the parent object of the Node
         self.creator = creator
 
-        self.canvas.tag_bind(self.itemId, '<ButtonPress-1>', self.__startMove)
-        self.canvas.tag_bind(self.itemId, '<B1-Motion>', self.__continueMove)
-        self.canvas.tag_bind(self.itemId, '<ButtonRelease-1>', self.__endMove)
-        secondaryButtons = ['2', '3']
-        for but in secondaryButtons:
-            self.canvas.tag_bind(self.itemId, '<ButtonPress-'+but+'>', self.__startConnect)
-            self.canvas.tag_bind(self.itemId, '<B'+but+'-Motion>', self.__continueConnect)
-            self.canvas.tag_bind(self.itemId, '<ButtonRelease-'+but+'>', self.__endConnect)
-
         #the line originating from the Node currently being drawn
         self.curLine = None
-        #the adjacent Nodes to the Node
+        #the adjacent Nodes to the Node, mapped to the Line drawn to each
         self.neighbors = {}
-        #the parent Nodes adjacent to this Node
+        #the parent Nodes adjacent to this Node, mapped to the Line drawn from each
         self.parents = {}
-        #accumulates the expected number of goal Nodes that will be landed on
-        self.expected = None
-        #holds the current best dice to choose at this Node
-        self.dice = None
-        #the best choices to make for each number rolled
-        self.bestRollChoices = None
         #whether the Node is a goal
-        self.isGoal = False
+        self.isGoal = isGoal
+
+    #returns the Tcl command drawing the rectangle of a Node centered at (x, y) on the canvas with the given
+    #path, with the given fill and outline colors and outline width, which gives the ID of the rectangle
+    @staticmethod
+    def createScript(canvasPath, x, y, fill, outline, width):
+        return canvasPath + " create rectangle " + " ".join(map(repr, (
+            float(x) - Node.halfWidth, float(y) - Node.halfWidth, float(x) + Node.halfWidth,
+            float(y) + Node.halfWidth))) + " -fill " + fill + " -outline " + outline + " -width " + str(width) + \
+            " -activefill purple -tags " + Node.tag
+
+    #binds the mouse events of every Node on a canvas once, on the shared tag instead of on each Node
+    #nodeAt returns the Node an event happened on, or None
+    @staticmethod
+    def bindAll(canvas, nodeAt):
+        handlers = {'<ButtonPress-1>': Node.__startMove,
+                    '<B1-Motion>': Node.__continueMove,
+                    '<ButtonRelease-1>': Node.__endMove,
+                    '<Enter>': Node.__enter,
+                    '<Leave>': Node.__leave}
+        secondaryButtons = ['2', '3']
+        for but in secondaryButtons:
+            handlers['<ButtonPress-'+but+'>'] = Node.__startConnect
+            handlers['<B'+but+'-Motion>'] = Node.__continueConnect
+            handlers['<ButtonRelease-'+but+'>'] = Node.__endConnect
+        for sequence, handler in handlers.items():
+            canvas.tag_bind(Node.tag, sequence, lambda event, handler=handler: Node.__dispatch(handler, nodeAt(event), event))
+
+    @staticmethod
+    def __dispatch(handler, node, event):
+        if node is not None:
+            handler(node, event)
 
     #called when left mouse is pressed down on Node
     def __startMove(self, event):
         if (self.creator.clickFlag == 'none'):
-            coords = self.canvas.coords(self.itemId)
-            self.__coords = (coords[0] - event.x,
-                             coords[1] - event.y,
-                             coords[2] - event.x,
-                             coords[3] - event.y)
+            self.__offset = (self.x - event.x, self.y - event.y)
 
     #called when mouse is dragged after having been left-pressed on Node
+    #the Node moves at once, while its rectangle, lines and labels are redrawn once per frame however
+    #many motion events arrive in it
     def __continueMove(self, event):
         if (self.creator.clickFlag == 'none'):
-            x1 = self.__coords[0] + event.x
-            y1 = self.__coords[1] + event.y
-            x2 = self.__coords[2] + event.x
-            y2 = self.__coords[3] + event.y
-
-            self.canvas.coords(self.itemId, x1, y1, x2, y2)
-            for (neighbor, (line, direction)) in self.neighbors.items():
-                line.update(direction, x1, y1, x2, y2)
-            for (neighbor, (line, direction)) in self.parents.items():
-                line.update(direction, x1, y1, x2, y2)
+            self.x = self.__offset[0] + event.x
+            self.y = self.__offset[1] + event.y
+            self.creator.scheduleRedraw(self)
 
     #called when mouse is released after having been left-pressed on Node
     def __endMove(self, event):
@@ -134,20 +162,32 @@ class Node:
             self.creator.setGoal(self)
         else:
             self.__continueMove(event)
+            self.creator.redraw()
+
+    #moves the Node's rectangle and the ends of its lines to its center
+    def draw(self):
+        self.canvas.coords(self.itemId, self.x - Node.halfWidth, self.y - Node.halfWidth,
+                           self.x + Node.halfWidth, self.y + Node.halfWidth)
+        for neighbor, line in self.neighbors.items():
+            line.setCoords(self.x, self.y, neighbor.x, neighbor.y)
+        for parent, line in self.parents.items():
+            line.setCoords(parent.x, parent.y, self.x, self.y)
+
+    #called when the mouse moves over the Node
+    def __enter(self, event):
+        self.creator.hover(self)
+
+    #called when the mouse leaves the Node
+    def __leave(self, event):
+        self.creator.hover(None)
 
     #called when right mouse is pressed down on Node
     def __startConnect(self, event):
-        coords = self.canvas.coords(self.itemId)
-        startx = (coords[0]+coords[2])/2.0
-        starty = (coords[1]+coords[3])/2.0
-        self.curLine = Line(self.canvas, startx, starty, event.x, event.y)
+        self.curLine = Line(self.canvas, self.x, self.y, event.x, event.y)
 
     #called when mouse is dragged after having been right pressed on Node
     def __continueConnect(self, event):
-        coords = self.canvas.coords(self.itemId)
-        startx = (coords[0]+coords[2])/2.0
-        starty = (coords[1]+coords[3])/2.0
-        self.curLine.setCoords(startx, starty, event.x, event.y)
+        self.curLine.setCoords(self.x, self.y, event.x, event.y)
 
     #called when mouse is released after having been right pressed on Node
     def __endConnect(self, event):
@@ -155,39 +195,37 @@ class Node:
         if othNode:
             if othNode == self:
                 self.curLine.remove()
-                for neighbor, (line, dir) in self.neighbors.items():
+                for neighbor, line in self.neighbors.items():
                     line.remove()
                     del neighbor.parents[self]
-                for parent, (line, dir) in self.parents.items():
+                for parent, line in self.parents.items():
                     line.remove()
                     del parent.neighbors[self]
                 self.creator.destroyNode(self)
             elif othNode in self.neighbors or othNode in self.parents:
                 self.curLine.remove()
 
-                val = othNode.parents.get(self)
-                if val:
-                    line, _ = val
+                line = othNode.parents.get(self)
+                if line:
                     line.remove()
                     del othNode.parents[self]
                     del self.neighbors[othNode]
-                val = othNode.neighbors.get(self)
-                if val:
-                    line, _ = val
+                line = othNode.neighbors.get(self)
+                if line:
                     line.remove()
                     del othNode.neighbors[self]
                     del self.parents[othNode]
+                self.creator.markDirty(self, othNode)
+                self.creator.updateLabels(self, othNode)
+                self.creator.invalidateReachIndex()
             else:
-                coords = self.canvas.coords(self.itemId)
-                othCoords = self.canvas.coords(othNode.itemId)
-                startx = (coords[0] + coords[2]) / 2.0
-                starty = (coords[1] + coords[3]) / 2.0
-                endx = (othCoords[0] + othCoords[2]) / 2.0
-                endy = (othCoords[1] + othCoords[3]) / 2.0
-                self.curLine.setCoords(startx, starty, endx, endy)
-
-                self.neighbors[othNode] = (self.curLine, 0)
-                othNode.parents[self] = (self.curLine, 1)
+                self.curLine.setCoords(self.x, self.y, othNode.x, othNode.y)
+
+                self.neighbors[othNode] = self.curLine
+                othNode.parents[self] = self.curLine
+                self.creator.markDirty(self)
+                self.creator.updateLabels(self, othNode)
+                self.creator.invalidateReachIndex()
         else:
             self.curLine.remove()
         self.curLine = None
@@ -206,6 +244,7 @@ class LevelCreator:
         #the canvas id of the background rectangle
         self.backgroundId = self.canvas.create_rectangle(0, 0, self.width, self.height, fill='white')
         self.canvas.tag_bind(self.backgroundId, '<ButtonPress-1>', self.__createNode)
+        Node.bindAll(self.canvas, self.__eventNode)
 
         #a map of node canvas IDs to the Node objects
         self.nodeMap = {}
@@ -213,11 +252,37 @@ class LevelCreator:
         self.origin = None
         #contains modifiers for the behavior of the next click
         self.clickFlag = 'none'
+        #the walk reachability of the level, kept between solves until an edge changes
+        self.reachIndex = None
+        #the direction labels of each Node's neighbors, as (neighbor, label) pairs in label order
+        self.labels = {}
+        #the Nodes whose goal state, ordered neighbors or direction labels changed since the last solve was started
+        self.dirtyNodes = set()
+        #counts the label updates and canvas lookups made while editing since the last solve
+        self.stats = SolveStats()
+        #the heatmap colors of the Nodes, or None when the heatmap is hidden
+        self.heat = None
+        #called with the new origin Node whenever the origin is set
+        self.onOriginSet = None
+        #called with the Node under the mouse whenever the mouse enters or leaves a Node, or None once it left
+        self.onHover = None
+        #the Nodes moved since they were last drawn, and the id of the pending redraw, if any
+        self.movedNodes = set()
+        self.redrawId = None
+        #the time between redraws while dragging, in milliseconds
+        self.frameInterval = 16
+
+    #returns the Node a mouse event on the shared Node tag happened on, from the canvas item under the mouse
+    def __eventNode(self, event):
+        items = self.canvas.find_withtag('current')
+        return self.nodeMap.get(items[0]) if items else None
 
     #creates a Node from a mouse click event
     def __createNode(self, event):
         node = Node(self.canvas, self, event.x, event.y)
         self.nodeMap[node.itemId] = node
+        self.labels[node] = []
+        self.markDirty(node)
 
     #destroys a Node
     def destroyNode(self, node):
@@ -225,10 +290,64 @@ class LevelCreator:
             self.origin = None
         self.canvas.delete(node.itemId)
         del self.nodeMap[node.itemId]
+        del self.labels[node]
+        self.dirtyNodes.discard(node)
+        self.markDirty(*node.parents)
+        self.updateLabels(node)
+        self.invalidateReachIndex()
+
+    #records that the given Nodes need their values recomputed by the next solve
+    def markDirty(self, *nodes):
+        self.dirtyNodes.update(nodes)
+
+    #returns the Nodes changed since the last solve was started, starting a new set of changes
+    def takeDirtyNodes(self):
+        dirty = self.dirtyNodes
+        self.dirtyNodes = set()
+        return dirty
+
+    #returns the statistics collected while editing since the last call, starting a new collection
+    def takeStats(self):
+        stats = self.stats
+        self.stats = SolveStats()
+        return stats
+
+    #recomputes the direction labels of the given Nodes and the Nodes adjacent to them, which are
+    #the only labels that change when a Node moves or an edge is added or removed
+    def updateLabels(self, *nodes):
+        affected = set()
+        for node in nodes:
+            affected.add(node)
+            affected.update(node.neighbors)
+            affected.update(node.parents)
+        for node in affected:
+            if node.itemId in self.nodeMap:
+                self.stats.count('labelUpdates')
+                neighbors = list(node.neighbors)
+                ordered = directionLabels(node.x, node.y, [(neighbor.x, neighbor.y) for neighbor in neighbors],
+                                          [(parent.x, parent.y) for parent in node.parents])
+                labels = [(neighbors[ind], label) for ind, label in ordered]
+                #the solver breaks ties by neighbor order, so a reordered Node must be recomputed, and the
+                #last solve describes its choices by its labels, so it no longer answers once they change
+                if labels != self.labels[node]:
+                    self.markDirty(node)
+                self.labels[node] = labels
+
+    #discards the reachability index after the edges of the level change
+    def invalidateReachIndex(self):
+        self.reachIndex = None
+
+    #returns the reachability index for a snapshot of the level, only rebuilding it when the graph
+    #changed; moving a space can reorder its neighbors, which matches() also catches
+    def getReachIndex(self, board):
+        if self.reachIndex is None or not self.reachIndex.matches(board):
+            self.reachIndex = solver.ReachIndex(board)
+        return self.reachIndex
 
     #get Node at the given position
     def getNodeAt(self, x, y, fromNode):
         items = self.canvas.find_overlapping(x, y, x, y)
+        self.stats.count('canvasLookups')
         safetyNode = None
         for item in items:
             othNode = self.nodeMap.get(item)
@@ -240,30 +359,133 @@ class LevelCreator:
 
     #sets the origin Node
     def setOrigin(self, origin):
-        if self.origin:
-            self.canvas.itemconfig(self.origin.itemId, fill='blue')
-        self.canvas.itemconfig(origin.itemId, fill='green')
+        oldOrigin = self.origin
         self.origin = origin
+        if oldOrigin:
+            self.__recolor(oldOrigin)
+        self.__recolor(origin)
         self.clickFlag = 'none'
+        if self.onOriginSet:
+            self.onOriginSet(origin)
 
     #sets the goal Node
     def setGoal(self, goal):
         goal.isGoal = not goal.isGoal
-        if goal.isGoal:
-            self.canvas.itemconfig(goal.itemId, fill='red')
-        else:
-            self.canvas.itemconfig(goal.itemId, fill='blue')
+        self.markDirty(goal)
+        self.__recolor(goal)
         self.clickFlag = 'none'
 
-#Represents a character in the game that has both a main die and an ally die
-class Character:
-    def __init__(self, name, mainDice, allyDice):
-        #the name of the character
-        self.name = name
-        #a list of the possible rolls for the main dice
-        self.mainDice = mainDice
-        #a list of the possible rolls for the ally dice
-        self.allyDice = allyDice
+    #colors a Node by its role, or by its heatmap color with its role shown by the outline
+    def __recolor(self, node):
+        self.canvas.itemconfig(node.itemId, **self.__colors(node is self.origin, node.isGoal,
+                                                            self.heat.get(node) if self.heat else None))
+
+    #returns the fill and outline colors and outline width of a Node given its role and heatmap color, if any
+    def __colors(self, isOrigin, isGoal, heat):
+        role = 'green' if isOrigin else 'red' if isGoal else None
+        if self.heat is None:
+            return {'fill': role or 'blue', 'outline': 'black', 'width': 1}
+        return {'fill': heat or 'blue', 'outline': role or 'black', 'width': 3 if role else 1}
+
+    #colors the Nodes by the given heatmap colors, or by their roles again when given None
+    def setHeat(self, heat):
+        self.heat = heat
+        for node in self.nodeMap.values():
+            self.__recolor(node)
+
+    #reports the Node under the mouse, or None once the mouse left it
+    def hover(self, node):
+        if self.onHover:
+            self.onHover(node)
+
+    #adds an edge leading from one Node to another, drawn as a new line between their centers unless
+    #lineIds gives the IDs of a line and arrow head already drawn
+    def connect(self, node, othNode, lineIds=None):
+        line = Line(self.canvas, node.x, node.y, othNode.x, othNode.y, lineIds)
+        node.neighbors[othNode] = line
+        othNode.parents[node] = line
+
+    #marks a Node as moved, drawing it with every other moved Node at the next frame
+    def scheduleRedraw(self, node):
+        self.movedNodes.add(node)
+        if self.redrawId is None:
+            self.redrawId = self.canvas.after(self.frameInterval, self.redraw)
+
+    #draws the Nodes moved since the last frame and updates their direction labels
+    def redraw(self):
+        if self.redrawId is not None:
+            self.canvas.after_cancel(self.redrawId)
+            self.redrawId = None
+        moved = [node for node in self.movedNodes if node.itemId in self.nodeMap]
+        self.movedNodes = set()
+        for node in moved:
+            node.draw()
+        if moved:
+            self.updateLabels(*moved)
+
+    #removes every Node and edge from the level
+    def clear(self):
+        self.redraw()
+        for node in list(self.nodeMap.values()):
+            for line in node.neighbors.values():
+                line.remove()
+            self.canvas.delete(node.itemId)
+        self.nodeMap = {}
+        self.origin = None
+        self.clickFlag = 'none'
+        self.labels = {}
+        self.dirtyNodes = set()
+        if self.heat is not None:
+            self.heat = {}
+        self.invalidateReachIndex()
+
+    #replaces the level with the spaces, edges, goals and origin of a Board
+    #every item is created by a single Tcl script, already colored and without any bindings of its own,
+    #and the labels of every Node are computed once at the end
+    def loadBoard(self, board):
+        self.clear()
+        canvasPath = str(self.canvas)
+        script = [Node.createScript(canvasPath, board.xs[node], board.ys[node],
+                                    **self.__colors(node == board.origin, board.goals[node], None))
+                  for node in range(board.nodeCount)]
+        edges = board.edges()
+        for source, target in edges:
+            script.extend(Line.createScript(canvasPath, board.xs[source], board.ys[source], board.xs[target],
+                                            board.ys[target]))
+        itemIds = [int(itemId) for itemId in
+                   self.canvas.tk.splitlist(self.canvas.tk.eval("list " + " ".join("[" + command + "]"
+                                                                                    for command in script)))]
+
+        nodes = [Node(self.canvas, self, board.xs[node], board.ys[node], bool(board.goals[node]), itemIds[node])
+                 for node in range(board.nodeCount)]
+        for newNode in nodes:
+            self.nodeMap[newNode.itemId] = newNode
+            self.labels[newNode] = []
+        for edge, (source, target) in enumerate(edges):
+            lineIds = itemIds[board.nodeCount+2*edge:board.nodeCount+2*edge+2]
+            self.connect(nodes[source], nodes[target], lineIds)
+        #the origin is set directly, as its rectangle was already colored
+        if board.origin is not None:
+            self.origin = nodes[board.origin]
+            if self.onOriginSet:
+                self.onOriginSet(self.origin)
+        self.markDirty(*nodes)
+        self.updateLabels(*nodes)
+
+    #snapshots the level into a Board, returning it along with the Nodes in Board order
+    def toBoard(self):
+        self.redraw()
+        nodes = list(self.nodeMap.values())
+        indices = {node: ind for ind, node in enumerate(nodes)}
+        coords = [(node.x, node.y) for node in nodes]
+        edges = []
+        labels = []
+        for node in nodes:
+            for neighbor, label in self.labels[node]:
+                edges.append((indices[node], indices[neighbor]))
+                labels.append(label)
+        goals = [ind for ind, node in enumerate(nodes) if node.isGoal]
+        return Board(coords, edges, goals, indices.get(self.origin), labels), nodes
 
 #The main GUI class
 class ChooseDice:
@@ -293,9 +515,34 @@ class ChooseDice:
         self.turnsLabelStringVar.set("# of turns:")
 
         #Slider allowing input of the number of turns to solve for
-        self.turnsInputResult = Scale(self.frame, from_=1, to=30, orient=HORIZONTAL)
+        self.turnsInputResult = Scale(self.frame, from_=1, to=500, orient=HORIZONTAL, command=self.__showSolution)
         self.turnsInputResult.grid(row=1, column=3, rowspan=1, columnspan=1)
 
+        #Checkbox choosing whether to stop solving once the answer settles, extrapolating the remaining turns
+        #it starts unchecked, so a solve gives exact values unless extrapolation is asked for
+        self.extrapolateVar = IntVar(value=0)
+        self.extrapolateCheck = Checkbutton(self.frame, text='Extrapolate once converged', variable=self.extrapolateVar)
+        self.extrapolateCheck.grid(row=5, column=0, columnspan=2)
+        #the largest change in any space's gain per turn that still counts as converged
+        self.tolerance = 1e-9
+
+        #Checkbox showing the expected goals from every space as a heatmap
+        self.heatmapVar = IntVar(value=0)
+        self.heatmapCheck = Checkbutton(self.frame, text='Show heatmap', variable=self.heatmapVar,
+                                        command=self.toggleHeatmap)
+        self.heatmapCheck.grid(row=5, column=2, columnspan=2)
+
+        #the button that writes the tables of the last solve to a file
+        self.exportButton = Button(
+            self.frame, text='Export results', fg='red', command=self.exportResults, state=DISABLED
+        )
+        self.exportButton.grid(row=5, column=4, columnspan=2)
+
+        #the label that shows the value of the space under the mouse
+        self.hoverStringVar = StringVar()
+        self.hoverResult = Label(self.frame, textvariable=self.hoverStringVar)
+        self.hoverResult.grid(row=5, column=6, columnspan=3)
+
         #the button that starts the solve
         self.solveButton = Button(
             self.frame, text='Solve', fg='red', command=self.solve
@@ -308,6 +555,58 @@ class ChooseDice:
         self.solveResult.grid(row=3, column=2, columnspan=5)
         self.solveResultStringVar.set("")
 
+        #the button that stops the solve in progress
+        self.cancelButton = Button(
+            self.frame, text='Cancel solve', fg='red', command=self.cancel, state=DISABLED
+        )
+        self.cancelButton.grid(row=3, column=0, columnspan=2)
+
+        #the solver, which keeps the tables of the last solve to speed up the next one, and keeps every
+        #finished solve on disk when NumPy is installed
+        try:
+            cache = SolveCache() if solver.np is not None else None
+        except OSError:
+            cache = None
+        self.solver = solver.Solver(cache=cache)
+        #the solve running in the background, if any
+        self.solveWorker = None
+        #the Nodes changed before the background solve started, to be solved again if it does not finish
+        self.solveDirtyNodes = set()
+        #the number of turns and description of the latest answer from the background solve
+        self.lastPartialResult = None
+        #the position of each Node of the level being solved in the background
+        self.solveIndices = {}
+        #the last solve that finished, which answers for every space and number of turns it solved
+        self.lastSolution = None
+        #the position of each Node in the last solve that finished
+        self.lastIndices = {}
+        self.levelCreate.onOriginSet = self.__showSolution
+        self.levelCreate.onHover = self.__showHover
+        #how often to check the background solve for progress, in milliseconds
+        self.pollInterval = 50
+
+        #the button that shows or hides the statistics of the last solve
+        self.statsButton = Button(
+            self.frame, text='Show statistics', fg='red', command=self.toggleStats
+        )
+        self.statsButton.grid(row=4, column=0, columnspan=2)
+
+        #the panel holding the statistics of the last solve, only shown once expanded
+        self.statsPanel = Frame(self.frame)
+        self.statsResultStringVar = StringVar()
+        self.statsResult = Label(self.statsPanel, textvariable=self.statsResultStringVar, justify=LEFT)
+        self.statsResult.grid(row=0, column=0)
+        self.saveStatsButton = Button(
+            self.statsPanel, text='Save statistics', fg='red', command=self.saveStats, state=DISABLED
+        )
+        self.saveStatsButton.grid(row=1, column=0)
+        #whether statistics are collected and shown, which is only done while the panel is expanded
+        self.statsShown = False
+        #the statistics of the solve running in the background
+        self.solveStats = None
+        #the statistics of the last solve that finished
+        self.lastStats = None
+
         #the button to add a new character
         self.addButton = Button(
             self.frame, text='Add character', fg='red', command=self.add
@@ -320,191 +619,284 @@ class ChooseDice:
         )
         self.removeButton.grid(row=2, column=9, columnspan=2)
 
+        #the button that searches every lineup of the current size for the best ones
+        self.optimizeButton = Button(
+            self.frame, text='Find best lineup', fg='red', command=self.optimize
+        )
+        self.optimizeButton.grid(row=3, column=9, columnspan=2)
+        #the lineup search running in the background, if any
+        self.optimizeWorker = None
+        #the number of lineups the search ranks
+        self.optimizeTop = 5
+        #the number of turns and ranking of the latest answer from the lineup search
+        self.lastRanking = None
+
+        #the button to save the level to a board file
+        self.saveButton = Button(
+            self.frame, text='Save board', fg='red', command=self.saveBoard
+        )
+        self.saveButton.grid(row=1, column=11)
+
+        #the button to replace the level with one from a board file
+        self.loadButton = Button(
+            self.frame, text='Load board', fg='red', command=self.loadBoard
+        )
+        self.loadButton.grid(row=2, column=11)
+
         #holds the drop down menus to select each character
         self.characterMenus = []
 
         #holds the names of all the characters
         self.characterNames = []
 
-        allyDice = [1,2]
-
         #list of all the possible characters
-        self.characterList = sorted([
-            Character('Donkey Kong', [0,0,0,0,10,10], allyDice),
-            Character('Bowser', [0,0,1,8,9,10], allyDice),
-            Character('Boo', [0,0,5,5,7,7], allyDice),
-            Character('Wario', [0,0,6,6,6,6], allyDice),
-            Character('Peach', [0,2,4,4,4,6], allyDice),
-            Character('Daisy', [3,3,3,3,4,4], allyDice),
-            Character('Dry Bones', [1,1,1,6,6,6], allyDice),
-            Character('Pom Pom', [0,3,3,3,3,8], allyDice),
-            Character('Mario', [1,3,3,3,5,6], allyDice),
-            Character('Luigi', [1,1,1,5,6,7], allyDice),
-            Character('Waluigi', [0,1,3,5,5,7], allyDice),
-            Character('Goomba', [0,0,3,4,5,6], allyDice),
-            Character('Bowser Jr.', [1,1,1,4,4,9], allyDice),
-            Character('Rosalina', [0,0,2,3,4,8], allyDice),
-            Character('Diddy Kong', [0,0,0,7,7,7], allyDice),
-            Character('Monty Mole', [0,2,3,4,5,6], allyDice),
-            Character('Shy Guy', [0,4,4,4,4,4], allyDice),
-            Character('Yoshi', [0,1,3,3,5,7], allyDice),
-            Character('Hammer Bro', [0,1,1,5,5,5], allyDice),
-            Character('Koopa', [1,1,2,3,3,10], allyDice)
-        ], key=lambda character: character.name)
+        self.characterList = defaultCharacters()
         self.charactersMap = {}
         for character in self.characterList:
             self.charactersMap[character.name] = character
         self.add()
 
     #produces the best course of action to reach the goal node from the origin node
+    #the level is snapshotted here so that it can be edited while the solve runs in the background
     def solve(self):
-        origin = self.levelCreate.origin
-        if not origin:
+        with self.levelCreate.stats.phase('snapshot'):
+            board, nodes = self.levelCreate.toBoard()
+        if board.origin is None:
             return
 
-        diceDistributions = self.__genDistributions()
-        itCount = self.turnsInputResult.get()
-
-        for _, node in self.levelCreate.nodeMap.items():
-            fillVal = 1 if node.isGoal else 0
-            node.expected = [fillVal]*(itCount+1)
-            node.dice = [None]*(itCount+1)
-            node.bestRollChoices = [None]*(itCount+1)
-        for i in range(1, itCount+1):
-            for _, node in self.levelCreate.nodeMap.items():
-                maxExpected = 0
-                bestDice = None
-                bestRollChoices = None
-                for diceInd, dist in enumerate(diceDistributions):
-                    rollExpected = [float("-inf") for _ in dist]
-                    rollChoices = [() for _ in dist]
-                    nodeStack = [(node, 0, ())]
-                    while nodeStack:
-                        nextNode, distance, curChoices = nodeStack.pop()
-                        candidate = nextNode.expected[i-1]
-                        if dist[distance] and candidate > rollExpected[distance]:
-                            rollExpected[distance] = candidate
-                            rollChoices[distance] = curChoices
-                        if distance != len(dist)-1:
-                            dirNeighbors = self.__neighborsToDirection(nextNode)
-                            for neighbor, dirStr in dirNeighbors.items():
-                                newChoices = curChoices
-                                if dirStr:
-                                    newChoices += (dirStr,)
-                                nodeStack.append((neighbor, distance+1, newChoices))
-                    expectedValue = 0
-                    totalDensity = 0
-                    for ind, dens in enumerate(dist):
-                        safeExpected = rollExpected[ind]
-                        if safeExpected == float("-inf"):
-                            safeExpected = 0
-                        expectedValue += safeExpected * dens
-                        totalDensity += dens
-                    expectedValue /= totalDensity
-                    if expectedValue > maxExpected:
-                        maxExpected = expectedValue
-                        bestDice = diceInd
-                        bestRollChoices = rollChoices
-                if node.isGoal:
-                    maxExpected += 1
-                node.expected[i] = maxExpected
-                node.dice[i] = bestDice
-                node.bestRollChoices[i] = bestRollChoices
-        characterInd = origin.dice[itCount]
-        if characterInd is None:
-            characterInd = 0
-        bestCharacterStr = self.characterNames[characterInd].get()
-        expectedValueStr = str(origin.expected[itCount])
-
-        resultStr = "Best character: " + bestCharacterStr + " with " + expectedValueStr + " goal squares after " + str(itCount) + " turns"
-        if origin.bestRollChoices[-1]:
-            for roll, choices in enumerate(origin.bestRollChoices[-1]):
-                if choices:
-                    resultStr += "\nOn " + str(roll) + " roll: " + choices[0]
-                    for choice in choices[1:]:
-                        resultStr += ", " + choice
-        self.solveResultStringVar.set(resultStr)
-
-    #generates the distributions of possible rolls for each possible character choice
-    def __genDistributions(self):
-        out = []
-        selectedChars = [self.charactersMap.get(nameVar.get()) for nameVar in self.characterNames]
-        for charInd, character in enumerate(selectedChars):
-            allies = selectedChars[charInd+1:]+selectedChars[:charInd]
-            dice = [[0,0]] + [character.mainDice] + [ally.allyDice for ally in allies]
-            maxRoll = 0
-            for d in dice:
-                maxRoll += d[-1]
-            curDist = [0]*(maxRoll+1)
-            indStack = [0]
-            curSum = 0
-            while indStack[0] == 0:
-                while len(indStack) < len(dice):
-                    curSum += dice[len(indStack)][0]
-                    indStack.append(0)
-                curDist[curSum] += 1
-                curSum -= dice[len(indStack) - 1][indStack[-1]]
-                indStack[-1] += 1
-                while indStack[-1] == len(dice[len(indStack) - 1]):
-                    indStack.pop()
-                    curSum -= dice[len(indStack) - 1][indStack[-1]]
-                    indStack[-1] += 1
-                curSum += dice[len(indStack) - 1][indStack[-1]]
-            out.append(curDist)
-        return out
-
-    #returns English descriptions of the relative positions of each neighbor to the passed-in node
-    def __neighborsToDirection(self, node):
-        canvas = self.levelCreate.canvas
-        dirNeighbors = {}
-
-        if len(node.neighbors) == 1:
-            for neighbor in node.neighbors:
-                dirNeighbors[neighbor] = ""
-        elif not node.parents:
-            for neighbor in node.neighbors:
-                line, _ = node.neighbors[neighbor]
-                lineCoords = canvas.coords(line.lineId)
-                rotatedDir = math.atan2(lineCoords[2]-lineCoords[0], lineCoords[1]-lineCoords[3])
-                dirNeighbors[neighbor] = str(int(rotatedDir*180/math.pi))+" degrees clockwise from North"
-        else:
-            leftNeighbors = []
-
-            for neighbor in node.neighbors:
-                accum = [0,0]
-                for parent, (line, _) in node.parents.items():
-                    lineCoords = canvas.coords(line.lineId)
-                    accum[0] += lineCoords[2]-lineCoords[0]
-                    accum[1] += lineCoords[1]-lineCoords[3]
-                fromDir = math.atan2(*accum)
-                line, _ = node.neighbors[neighbor]
-                lineCoords = canvas.coords(line.lineId)
-                toDir = math.atan2(lineCoords[2]-lineCoords[0], lineCoords[1]-lineCoords[3])
-                rotatedDir = (toDir-fromDir)%(2*math.pi)
-                if rotatedDir > math.pi:
-                    rotatedDir -= 2*math.pi
-                leftNeighbors.append((rotatedDir, neighbor))
-            leftNeighbors.sort(key=lambda neigh: neigh[0])
-
-            if len(leftNeighbors) == 2:
-                dirNeighbors[leftNeighbors[0][1]] = "left"
-                dirNeighbors[leftNeighbors[1][1]] = "right"
+        self.cancel()
+        self.lastPartialResult = None
+        editStats = self.levelCreate.takeStats()
+        self.solveStats = editStats if self.statsShown else None
+        self.solveDirtyNodes = self.levelCreate.takeDirtyNodes()
+        indices = {node: ind for ind, node in enumerate(nodes)}
+        self.solveIndices = indices
+        dirty = [indices[node] for node in self.solveDirtyNodes if node in indices]
+        turns = self.turnsInputResult.get()
+        #every turn is kept, both to answer the slider from the last solve and to re-solve after edits,
+        #which costs about (maxRoll+2)*8 bytes per space for each turn
+        solutions = self.solver.iterSolve(board, self.__selectedCharacters(), turns,
+                                          self.levelCreate.getReachIndex(board), history=True, dirty=dirty,
+                                          keys=nodes, stats=self.solveStats,
+                                          tolerance=self.tolerance if self.extrapolateVar.get() else None)
+        self.solveWorker = solver.BackgroundSolve(solutions, turns)
+        self.solveResultStringVar.set("Solving...")
+        self.cancelButton.config(state=NORMAL)
+        self.frame.after(self.pollInterval, self.__pollSolve, self.solveWorker)
+
+    #handler for clicking the find best lineup button, which ranks every lineup with as many characters
+    #as there are drop-down menus and selects the best one once the search finishes
+    def optimize(self):
+        board, _ = self.levelCreate.toBoard()
+        if board.origin is None:
+            return
+
+        self.cancel()
+        turns = self.turnsInputResult.get()
+        self.lastRanking = None
+        self.optimizeWorker = optimizer.BackgroundOptimize(board, self.characterList, len(self.characterMenus),
+                                                           turns, top=self.optimizeTop)
+        self.solveResultStringVar.set("Searching lineups...")
+        self.cancelButton.config(state=NORMAL)
+        self.frame.after(self.pollInterval, self.__pollOptimize, self.optimizeWorker, turns)
+
+    #shows the progress of a background lineup search, checking again later until it finishes
+    def __pollOptimize(self, worker, turns):
+        if worker is not self.optimizeWorker:
+            return
+        while True:
+            try:
+                kind, evaluated, payload = worker.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                self.lastRanking = (turns, payload)
+                self.solveResultStringVar.set("Searched " + str(evaluated) + " lineups\n" +
+                                              optimizer.describeRanking(payload, turns))
             else:
-                for ind, (_, neighbor) in enumerate(leftNeighbors):
-                    dirNeighbors[neighbor] = str(ind+1)+self.__ordinal(ind+1)+" from left"
-
-        return dirNeighbors
-
-    #produces the English ordinal suffix for the passed in number
-    def __ordinal(self, num):
-        mod = num%10
-        if mod == 1 and num != 11:
-            return "st"
-        if mod == 2 and num != 12:
-            return "nd"
-        if mod == 3 and num != 13:
-            return "rd"
-        return "th"
+                if kind == 'done':
+                    self.solveResultStringVar.set(optimizer.describeRanking(payload, turns))
+                    if payload:
+                        for nameVar, character in zip(self.characterNames, payload[0][1]):
+                            nameVar.set(character.name)
+                else:
+                    self.solveResultStringVar.set("Search failed: " + str(payload))
+                self.optimizeWorker = None
+                self.cancelButton.config(state=DISABLED)
+                return
+        self.frame.after(self.pollInterval, self.__pollOptimize, worker, turns)
+
+    #handler for clicking the cancel button, which keeps the best answer found so far
+    def cancel(self):
+        if self.optimizeWorker:
+            self.optimizeWorker.cancel()
+            self.optimizeWorker = None
+            self.cancelButton.config(state=DISABLED)
+            resultStr = "Search cancelled"
+            if self.lastRanking:
+                turns, ranking = self.lastRanking
+                resultStr += "\n" + optimizer.describeRanking(ranking, turns)
+            self.solveResultStringVar.set(resultStr)
+        if self.solveWorker:
+            self.solveWorker.cancel()
+            self.solveWorker = None
+            self.levelCreate.markDirty(*self.solveDirtyNodes)
+            self.cancelButton.config(state=DISABLED)
+            resultStr = "Solve cancelled"
+            if self.lastPartialResult:
+                turns, description = self.lastPartialResult
+                resultStr += " after " + str(turns) + " turns\n" + description
+            self.solveResultStringVar.set(resultStr)
+
+    #shows the progress of a background solve, checking again later until it finishes
+    def __pollSolve(self, worker):
+        if worker is not self.solveWorker:
+            return
+        while True:
+            try:
+                kind, turns, payload = worker.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'turn':
+                self.lastPartialResult = (turns, payload)
+                self.solveResultStringVar.set("Solved " + str(turns) + " of " + str(worker.turns) + " turns\n" + payload)
+            else:
+                if kind == 'done':
+                    self.solveResultStringVar.set(payload.describe(payload.board.origin))
+                    self.lastSolution = payload
+                    self.lastIndices = self.solveIndices
+                    self.exportButton.config(state=NORMAL)
+                    if self.solveStats is not None:
+                        self.lastStats = self.solveStats
+                        self.statsResultStringVar.set(self.lastStats.report())
+                        self.saveStatsButton.config(state=NORMAL)
+                else:
+                    self.levelCreate.markDirty(*self.solveDirtyNodes)
+                    self.solveResultStringVar.set("Solve failed: " + str(payload))
+                self.solveWorker = None
+                self.cancelButton.config(state=DISABLED)
+                self.__showHeatmap()
+                return
+        self.frame.after(self.pollInterval, self.__pollSolve, worker)
+
+    #returns the last solve that finished if it still answers for the level, which is when nothing
+    #affecting the values was edited since it started and the same characters are selected
+    def __currentSolution(self):
+        if self.lastSolution is None or self.solveWorker or self.levelCreate.dirtyNodes:
+            return None
+        if self.__selectedCharacters() != list(self.lastSolution.lineup):
+            return None
+        return self.lastSolution
+
+    #the number of turns to answer for from a solve: the slider's, unless the solve does not keep them
+    def __shownTurns(self, solution):
+        turns = self.turnsInputResult.get()
+        return turns if solution.hasTurn(turns) else solution.turns
+
+    #answers for the current origin and number of turns from the last solve without solving again,
+    #called whenever the origin is set or the slider is moved
+    def __showSolution(self, *args):
+        solution = self.__currentSolution()
+        if solution is None or self.optimizeWorker:
+            return
+        origin = self.lastIndices.get(self.levelCreate.origin)
+        if origin is not None:
+            self.solveResultStringVar.set(solution.describe(origin, self.__shownTurns(solution)))
+        self.__showHeatmap()
+
+    #colors every space of the last solve by its expected goals, if the heatmap is shown
+    def __showHeatmap(self):
+        solution = self.__currentSolution()
+        if not self.heatmapVar.get() or solution is None:
+            return
+        values = solution.getValues(self.__shownTurns(solution))
+        most = max(values, default=0)
+        self.levelCreate.setHeat({node: heatColor(values[ind]/most if most > 0 else 0.0)
+                                  for node, ind in self.lastIndices.items()})
+
+    #shows the value of the space under the mouse from the last solve
+    def __showHover(self, node):
+        solution = self.__currentSolution()
+        ind = self.lastIndices.get(node) if solution else None
+        if ind is None:
+            self.hoverStringVar.set("")
+            return
+        turns = self.__shownTurns(solution)
+        hoverStr = str(solution.getExpected(ind, turns)) + " goal squares after " + str(turns) + " turns"
+        characterInd = solution.getDice(ind, turns)
+        if characterInd is not None:
+            hoverStr += " with " + solution.lineup[characterInd].name
+        self.hoverStringVar.set(hoverStr)
+
+    #handler for clicking the heatmap checkbox
+    def toggleHeatmap(self):
+        if self.heatmapVar.get():
+            self.levelCreate.setHeat({})
+            self.__showHeatmap()
+        else:
+            self.levelCreate.setHeat(None)
+
+    #handler for clicking the export results button, which writes the last solve's tables as CSV,
+    #or as NumPy arrays when saved with the .npz extension
+    def exportResults(self):
+        if self.lastSolution is None:
+            return
+        path = filedialog.asksaveasfilename(defaultextension='.csv',
+                                            filetypes=[('CSV', '*.csv'), ('NumPy arrays', '*.npz')])
+        if path:
+            try:
+                if path.endswith('.npz'):
+                    self.lastSolution.saveArrays(path)
+                else:
+                    self.lastSolution.saveCsv(path)
+            except (OSError, ValueError) as err:
+                self.solveResultStringVar.set("Could not export results: " + str(err))
+
+    #handler for clicking the statistics button, which expands or collapses the statistics panel
+    def toggleStats(self):
+        self.statsShown = not self.statsShown
+        if self.statsShown:
+            if self.lastStats is None:
+                self.statsResultStringVar.set("Solve to collect statistics")
+            self.statsPanel.grid(row=4, column=2, columnspan=7)
+            self.statsButton.config(text='Hide statistics')
+        else:
+            self.statsPanel.grid_remove()
+            self.statsButton.config(text='Show statistics')
+
+    #handler for clicking the save statistics button, which writes the last solve's statistics as JSON
+    def saveStats(self):
+        path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[('JSON', '*.json')])
+        if path and self.lastStats is not None:
+            self.lastStats.dump(path)
+
+    #handler for clicking the save board button
+    def saveBoard(self):
+        path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[('Board', '*.json')])
+        if path:
+            board, _ = self.levelCreate.toBoard()
+            saveBoard(board, path)
+
+    #handler for clicking the load board button
+    def loadBoard(self):
+        path = filedialog.askopenfilename(filetypes=[('Board', '*.json')])
+        if path:
+            try:
+                board = loadBoard(path)
+            except (OSError, ValueError, KeyError, TypeError) as err:
+                self.solveResultStringVar.set("Could not load board: " + str(err))
+                return
+            self.cancel()
+            self.solver.reset()
+            self.lastSolution = None
+            self.lastIndices = {}
+            self.exportButton.config(state=DISABLED)
+            self.levelCreate.loadBoard(board)
+            self.solveResultStringVar.set("")
+
+    #returns the Characters currently selected in the drop-down menus
+    def __selectedCharacters(self):
+        return [self.charactersMap.get(nameVar.get()) for nameVar in self.characterNames]
 
     #handler for clicking the set origin button
     def handleSetOrigin(self):
@@ -532,6 +924,10 @@ class ChooseDice:
             self.characterNames.pop()
 
 if __name__ == "__main__":
+    #with arguments, solves board files from the command line instead of opening the GUI
+    if len(sys.argv) > 1:
+        import batch
+        sys.exit(batch.main(sys.argv[1:]))
     root = Tk(className='Choose dice')
     app = ChooseDice(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,156 @@
+import json
+from functools import lru_cache
+
+#the number of lineups, characters and ally combinations whose distributions are kept
+cacheSize = 256
+
+#produces the histogram of a die, counting the weight of rolling each number
+#a die is either a list of its faces, each equally likely, or a dict mapping each face to its weight
+#raises a ValueError for a die without faces, with a face that is not a whole number of at least 0, or
+#with a weight that is not a number of at least 0, or whose weights are all 0
+def dieHistogram(die):
+    if isinstance(die, dict):
+        faces = list(die.items())
+    else:
+        faces = [(face, 1) for face in die]
+    if not faces:
+        raise ValueError("a die needs at least one face")
+    for face, weight in faces:
+        if isinstance(face, bool) or not isinstance(face, int) or face < 0:
+            raise ValueError("invalid die face: " + str(face))
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not weight >= 0:
+            raise ValueError("invalid die weight: " + str(weight))
+    if not any(weight for _, weight in faces):
+        raise ValueError("a die needs a face with a weight above 0")
+    hist = [0]*(max(face for face, _ in faces)+1)
+    for face, weight in faces:
+        hist[face] += weight
+    return tuple(hist)
+
+#produces the histogram of the sum of two independent rolls
+def convolve(first, second):
+    out = [0]*(len(first)+len(second)-1)
+    for roll, weight in enumerate(first):
+        if weight:
+            for otherRoll, otherWeight in enumerate(second):
+                out[roll+otherRoll] += weight*otherWeight
+    return tuple(out)
+
+#produces a die in the definition format, as a list of faces when they are equally likely
+def dieDefinition(die):
+    if isinstance(die, dict):
+        return {'faces': list(die.keys()), 'weights': list(die.values())}
+    return list(die)
+
+#reads a die from the definition format, raising a ValueError if its faces and weights do not pair up
+def parseDie(definition):
+    if isinstance(definition, dict):
+        faces = list(definition['faces'])
+        weights = list(definition['weights'])
+        if len(faces) != len(weights):
+            raise ValueError("a die needs one weight for each face")
+        return dict(zip(faces, weights))
+    return list(definition)
+
+#Represents a character in the game that has both a main die and an ally die
+#dice are lists of faces or dicts of face weights (see dieHistogram), and extraDice
+#are rolled along with the main die, such as the dice added by double or triple dice items
+class Character:
+    def __init__(self, name, mainDice, allyDice, extraDice=()):
+        #the name of the character
+        self.name = name
+        #a list of the possible rolls for the main dice
+        self.mainDice = mainDice
+        #a list of the possible rolls for the ally dice
+        self.allyDice = allyDice
+        #the dice rolled in addition to the main dice when this character is chosen
+        self.extraDice = list(extraDice)
+        #the histogram of the main dice summed with the extra dice
+        self.mainHistogram = dieHistogram(mainDice)
+        for die in self.extraDice:
+            self.mainHistogram = convolve(self.mainHistogram, dieHistogram(die))
+        #the histogram of the ally dice
+        self.allyHistogram = dieHistogram(allyDice)
+
+    #characters are equal when they have the same name and dice; characters with different names but
+    #the same dice still share the cached distributions of their dice (see characterDistribution)
+    def __eq__(self, other):
+        return isinstance(other, Character) and self.name == other.name and \
+            self.mainHistogram == other.mainHistogram and self.allyHistogram == other.allyHistogram
+
+    def __hash__(self):
+        return hash((self.name, self.mainHistogram, self.allyHistogram))
+
+    #produces the character in the definition format
+    def toDict(self):
+        out = {'name': self.name, 'main': dieDefinition(self.mainDice), 'ally': dieDefinition(self.allyDice)}
+        if self.extraDice:
+            out['extra'] = [dieDefinition(die) for die in self.extraDice]
+        return out
+
+    #reads a character from the definition format
+    @staticmethod
+    def fromDict(definition):
+        return Character(definition['name'], parseDie(definition['main']), parseDie(definition['ally']),
+                         [parseDie(die) for die in definition.get('extra', [])])
+
+#the characters of Super Mario Party, sorted by name
+def defaultCharacters():
+    allyDice = [1,2]
+    return sorted([
+        Character('Donkey Kong', [0,0,0,0,10,10], allyDice),
+        Character('Bowser', [0,0,1,8,9,10], allyDice),
+        Character('Boo', [0,0,5,5,7,7], allyDice),
+        Character('Wario', [0,0,6,6,6,6], allyDice),
+        Character('Peach', [0,2,4,4,4,6], allyDice),
+        Character('Daisy', [3,3,3,3,4,4], allyDice),
+        Character('Dry Bones', [1,1,1,6,6,6], allyDice),
+        Character('Pom Pom', [0,3,3,3,3,8], allyDice),
+        Character('Mario', [1,3,3,3,5,6], allyDice),
+        Character('Luigi', [1,1,1,5,6,7], allyDice),
+        Character('Waluigi', [0,1,3,5,5,7], allyDice),
+        Character('Goomba', [0,0,3,4,5,6], allyDice),
+        Character('Bowser Jr.', [1,1,1,4,4,9], allyDice),
+        Character('Rosalina', [0,0,2,3,4,8], allyDice),
+        Character('Diddy Kong', [0,0,0,7,7,7], allyDice),
+        Character('Monty Mole', [0,2,3,4,5,6], allyDice),
+        Character('Shy Guy', [0,4,4,4,4,4], allyDice),
+        Character('Yoshi', [0,1,3,3,5,7], allyDice),
+        Character('Hammer Bro', [0,1,1,5,5,5], allyDice),
+        Character('Koopa', [1,1,2,3,3,10], allyDice)
+    ], key=lambda character: character.name)
+
+#reads a list of character definitions from a JSON file
+def loadCharacters(path):
+    with open(path) as charFile:
+        return [Character.fromDict(definition) for definition in json.load(charFile)]
+
+#produces the histogram of the sum of the given ally dice histograms, which must be sorted
+#so that every ordering of the same allies shares one cache entry
+@lru_cache(maxsize=cacheSize)
+def allyDistribution(allyHistograms):
+    out = (1,)
+    for hist in allyHistograms:
+        out = convolve(out, hist)
+    return out
+
+#produces the distribution of rolls for a character with the given main histogram and allies
+@lru_cache(maxsize=cacheSize)
+def characterDistribution(mainHistogram, allyHistograms):
+    return convolve(mainHistogram, allyDistribution(allyHistograms))
+
+#produces the distributions of rolls for an ordered lineup, as a tuple of histograms
+@lru_cache(maxsize=cacheSize)
+def lineupDistributions(lineup):
+    out = []
+    for charInd, character in enumerate(lineup):
+        allies = lineup[charInd+1:]+lineup[:charInd]
+        out.append(characterDistribution(character.mainHistogram,
+                                         tuple(sorted(ally.allyHistogram for ally in allies))))
+    return tuple(out)
+
+#generates the distributions of possible rolls for each possible character choice in the lineup
+#each distribution gives the weight of rolling each total, with the other characters as allies;
+#only the characters whose dice or allies changed since a recent lineup are recomputed
+def genDistributions(lineup):
+    return list(lineupDistributions(tuple(lineup)))
@@ -0,0 +1,207 @@
+import heapq
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from dice import characterDistribution
+import solver
+
+#the board, candidates and solve settings that lineups are evaluated with in this process
+workerState = None
+
+#prepares a process to evaluate lineups, building the board's reachability index once for all of them
+def initWorker(board, characters, size, turns, origin, backend):
+    global workerState
+    workerState = (board, solver.ReachIndex(board), characters, size, turns, origin, backend)
+
+#returns the expected goals from the origin when the characters at the given positions in the
+#candidate list are the options on every turn
+#unless exact is set, each option rolls with size-1 allies of the shared ally die, so that more options
+#than the lineup size can be evaluated at once; more options never lower the expected goals, which
+#makes the result a bound on every lineup chosen from them
+def evaluate(options, exact):
+    board, index, characters, size, turns, origin, backend = workerState
+    lineup = [characters[ind] for ind in options]
+    distributions = None
+    if not exact:
+        allies = (characters[0].allyHistogram,)*(size-1)
+        distributions = [characterDistribution(character.mainHistogram, allies) for character in lineup]
+    solution = solver.solve(board, lineup, turns, index, backend, history=False, distributions=distributions)
+    return float(solution.expected[turns][origin])
+
+#evaluates each (options, exact) pair, across the pool when there is one
+def evaluateAll(executor, tasks):
+    if executor is None:
+        return [evaluate(options, exact) for options, exact in tasks]
+    return list(executor.map(evaluate, *zip(*tasks))) if tasks else []
+
+#searches every lineup of the given size chosen from the candidate characters for the ones with the
+#most expected goals from the origin (the board's own by default) after the given number of turns
+#yields (lineups evaluated, ranking) after each batch of evaluations, where the ranking lists the best
+#lineups found so far as (expected goals, lineup) pairs, best first, and the last ranking is final
+#when every candidate shares one ally die, a lineup's characters roll the same whatever their allies,
+#so the lineups are searched best bound first and a group of lineups is skipped once the bound on all
+#of them falls below the top lineups found; otherwise every lineup is solved
+#workers sets the number of processes, where 1 evaluates in this process
+#cancelled may be a function returning whether to stop after the current batch
+def iterOptimize(board, characters, size, turns, origin=None, top=10, workers=None, backend=None,
+                 cancelled=None):
+    if origin is None:
+        origin = board.origin
+    if origin is None:
+        raise ValueError("the board has no origin")
+    if not 1 <= size <= len(characters):
+        raise ValueError("the lineup size must be between 1 and the number of candidates")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    characters = list(characters)
+    settings = (board, characters, size, turns, origin, backend)
+    executor = None
+    if workers > 1:
+        #the pool is started from the GUI's search thread, so its processes must not be forked
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=solver.workerContext(),
+                                       initializer=initWorker, initargs=settings)
+    else:
+        initWorker(*settings)
+    try:
+        if len({character.allyHistogram for character in characters}) == 1:
+            yield from branchAndBound(executor, characters, size, top, workers*4, cancelled)
+        else:
+            yield from exhaustive(executor, characters, size, top, workers*4, cancelled)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+#returns the best lineups found so far, as (expected goals, lineup) pairs
+def ranking(best, characters):
+    return [(value, [characters[ind] for ind in lineup]) for value, lineup in best]
+
+#adds evaluated lineups to the sorted list of the best ones, keeping the given number of them
+#lineups with equal expected goals keep the order of the candidates
+def addResults(best, results, top):
+    best.extend(results)
+    best.sort(key=lambda result: (-result[0], result[1]))
+    del best[top:]
+
+#solves every lineup, a batch at a time
+def exhaustive(executor, characters, size, top, batchSize, cancelled):
+    best = []
+    evaluated = 0
+    lineups = list(combinations(range(len(characters)), size))
+    for start in range(0, len(lineups), batchSize):
+        if cancelled and cancelled():
+            return
+        batch = lineups[start:start+batchSize]
+        addResults(best, zip(evaluateAll(executor, [(lineup, True) for lineup in batch]), batch), top)
+        evaluated += len(batch)
+        yield evaluated, ranking(best, characters)
+
+#searches the lineups best bound first, where each search node is a prefix of a lineup in candidate order
+#along with the candidates that may complete it, bounded by solving with all of them as options
+def branchAndBound(executor, characters, size, top, batchSize, cancelled):
+    candidateCount = len(characters)
+    #the candidates are searched strongest first, so that good lineups are found early
+    solo = evaluateAll(executor, [((ind,), size == 1) for ind in range(candidateCount)])
+    best = []
+    evaluated = candidateCount
+    if size == 1:
+        addResults(best, [(value, (ind,)) for ind, value in enumerate(solo)], top)
+        yield evaluated, ranking(best, characters)
+        return
+    order = sorted(range(candidateCount), key=lambda ind: (-solo[ind], ind))
+    #search nodes as (-bound, prefix positions in order, position of the first candidate that may follow)
+    frontier = [(float("-inf"), (), 0)]
+    while frontier:
+        if cancelled and cancelled():
+            return
+        threshold = best[-1][0] if len(best) == top else float("-inf")
+        batch = []
+        while frontier and len(batch) < batchSize and -frontier[0][0] >= threshold:
+            batch.append(heapq.heappop(frontier))
+        if not batch:
+            break
+
+        children = []
+        tasks = []
+        for negBound, prefix, start in batch:
+            for pos in range(start, candidateCount-(size-len(prefix))+1):
+                child = prefix+(pos,)
+                if len(child) == size:
+                    children.append((child, True))
+                    tasks.append((tuple(order[ind] for ind in child), True))
+                elif pos == start and prefix:
+                    #the first child may pick from the same candidates as its parent, so shares its bound
+                    children.append((child, -negBound))
+                else:
+                    children.append((child, None))
+                    options = child+tuple(range(pos+1, candidateCount))
+                    tasks.append((tuple(order[ind] for ind in options), False))
+        values = iter(evaluateAll(executor, tasks))
+        evaluated += len(tasks)
+
+        leaves = []
+        for child, kind in children:
+            if kind is True:
+                leaves.append((next(values), tuple(sorted(order[ind] for ind in child))))
+            else:
+                bound = next(values) if kind is None else kind
+                heapq.heappush(frontier, (-bound, child, child[-1]+1))
+        addResults(best, leaves, top)
+        threshold = best[-1][0] if len(best) == top else float("-inf")
+        frontier = [node for node in frontier if -node[0] >= threshold]
+        heapq.heapify(frontier)
+        yield evaluated, ranking(best, characters)
+
+#finds the best lineups of the given size, returning them as (expected goals, lineup) pairs, best first
+#takes the same arguments as iterOptimize
+def optimizeLineup(board, characters, size, turns, origin=None, top=10, workers=None, backend=None):
+    out = []
+    for _, out in iterOptimize(board, characters, size, turns, origin, top, workers, backend):
+        pass
+    return out
+
+#produces a description of a ranking of lineups, as returned by optimizeLineup
+def describeRanking(ranking, turns):
+    resultStr = "Best lineups after " + str(turns) + " turns:"
+    for place, (value, lineup) in enumerate(ranking):
+        resultStr += "\n" + str(place+1) + ". " + ", ".join(character.name for character in lineup) + \
+            " with " + str(value) + " goal squares"
+    return resultStr
+
+#Runs a lineup search on a background thread, which can be cancelled between batches
+#messages are posted to results as (kind, evaluated, payload) tuples: ('progress', evaluated, ranking)
+#after each batch, then one of ('done', evaluated, ranking), ('cancelled', evaluated, ranking) or
+#('error', evaluated, exception), where evaluated counts the solves so far and ranking is as iterOptimize's
+#takes the same arguments as iterOptimize
+class BackgroundOptimize:
+    def __init__(self, board, characters, size, turns, origin=None, top=10, workers=None, backend=None):
+        #the messages posted by the search, to be polled by the caller
+        self.results = queue.Queue()
+        self.__cancelled = threading.Event()
+        self.__searches = iterOptimize(board, characters, size, turns, origin, top, workers, backend,
+                                       self.__cancelled.is_set)
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    #asks the search to stop after the batch it is working on
+    def cancel(self):
+        self.__cancelled.set()
+
+    #whether the search was asked to stop
+    @property
+    def cancelled(self):
+        return self.__cancelled.is_set()
+
+    def __run(self):
+        evaluated = 0
+        best = []
+        try:
+            for evaluated, best in self.__searches:
+                self.results.put(('progress', evaluated, best))
+            if self.__cancelled.is_set():
+                self.results.put(('cancelled', evaluated, best))
+            else:
+                self.results.put(('done', evaluated, best))
+        except Exception as err:
+            self.results.put(('error', evaluated, err))
@@ -0,0 +1,320 @@
+import argparse
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from batch import resultFields
+from board import Board
+from cache import SolveCache
+from dice import defaultCharacters, loadCharacters
+import solver
+
+#the address the server listens on by default, which only accepts connections from this machine
+defaultHost = '127.0.0.1'
+defaultPort = 8765
+#the most turns a request may ask for by default, which bounds the work any one request can cause
+defaultMaxTurns = 1000
+#the total size of the solutions kept in memory by default, in bytes
+defaultSolutionBytes = 1 << 30
+
+#returns the id of a board, a hash of its definition, so that uploading the same board again gives the same id
+def boardId(board):
+    text = json.dumps(board.toDict(), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+#Answers requests for the best dice from any space of uploaded boards, for the GUI-less tools that ask on
+#every turn; it is safe to use from many threads at once
+#the most recently used boards are kept along with their reachability indexes, and the most recently used
+#solutions, each answering every space and every number of turns up to the one it was solved for, so most
+#requests are answered without solving; identical requests arriving while one is being solved wait for it
+#instead of solving again
+#a solution keeps the values, characters and walk pointers of every turn, so the solutions are bounded by
+#their total size as well as their number, and one larger than the whole bound is answered but not kept
+class SolveService:
+    def __init__(self, characters=None, backend=None, cache=None, tolerance=None, maxBoards=64,
+                 maxSolutions=256, maxTurns=defaultMaxTurns, maxSolutionBytes=defaultSolutionBytes):
+        #the characters lineups are chosen from, by name
+        self.charactersMap = {character.name: character
+                              for character in (characters if characters is not None else defaultCharacters())}
+        #the solver backend to solve with; the parallel backend starts its worker processes for every solve,
+        #which would cost more than most solves the service makes
+        if backend == 'parallel':
+            raise ValueError("the solve service does not support the parallel backend")
+        self.backend = backend
+        #the on-disk cache of finished solves, if any
+        self.cache = cache
+        #the tolerance solves stop at once they converge, or None to solve every turn
+        self.tolerance = tolerance
+        #the number of boards and of solutions kept in memory
+        self.maxBoards = maxBoards
+        self.maxSolutions = maxSolutions
+        #the total size of the tables of the solutions kept in memory, in bytes
+        self.maxSolutionBytes = maxSolutionBytes
+        #the most turns a request may ask for
+        self.maxTurns = maxTurns
+        #counts the requests answered from memory, the solves made and the requests that waited for one
+        self.counters = {'answered': 0, 'solved': 0, 'coalesced': 0}
+        self.__lock = threading.Lock()
+        #(board, reachability index) pairs by board id, least recently used first
+        self.__boards = OrderedDict()
+        #solutions by (board id, lineup names), least recently used first, and the size of each one's tables
+        self.__solutions = OrderedDict()
+        self.__solutionBytes = {}
+        #futures of the solves in progress by (board id, lineup names, turns)
+        self.__pending = {}
+
+    #keeps a board given in the board file format, returning its id
+    def addBoard(self, definition):
+        try:
+            board = Board.fromDict(definition)
+        except (AttributeError, KeyError, TypeError) as err:
+            raise ValueError("invalid board: " + str(err))
+        key = boardId(board)
+        with self.__lock:
+            if key not in self.__boards:
+                self.__boards[key] = (board, solver.ReachIndex(board))
+            self.__boards.move_to_end(key)
+            while len(self.__boards) > self.maxBoards:
+                self.__boards.popitem(last=False)
+        return key
+
+    #returns the board with the given id, raising a KeyError if it is not kept
+    def getBoard(self, key):
+        with self.__lock:
+            if key not in self.__boards:
+                raise KeyError("unknown board: " + str(key))
+            self.__boards.move_to_end(key)
+            return self.__boards[key]
+
+    #returns the Characters with the given names, raising a ValueError for an unknown name
+    def getLineup(self, names):
+        if not names:
+            raise ValueError("the lineup is empty")
+        for name in names:
+            if name not in self.charactersMap:
+                raise ValueError("unknown character: " + str(name))
+        return [self.charactersMap[name] for name in names]
+
+    #answers a request for the best course of action, returning the answer in the batch result format
+    #board is either the id of a kept board or a board in the board file format, which is then kept;
+    #origin defaults to the board's own
+    def query(self, board, lineup, turns, origin=None):
+        key = self.addBoard(board) if isinstance(board, dict) else board
+        board, index = self.getBoard(key)
+        names = tuple(lineup)
+        lineup = self.getLineup(names)
+        if isinstance(turns, bool) or not isinstance(turns, int) or turns < 1:
+            raise ValueError("the number of turns must be a whole number of at least 1")
+        if turns > self.maxTurns:
+            raise ValueError("the number of turns must be at most " + str(self.maxTurns))
+        if origin is None:
+            origin = board.origin
+        if isinstance(origin, bool) or not isinstance(origin, int) or not 0 <= origin < board.nodeCount:
+            raise ValueError("invalid origin: " + str(origin))
+
+        solution = self.__solution(key, board, index, names, lineup, turns)
+        return dict({'board': key, 'lineup': list(names)}, **resultFields(solution, origin, turns))
+
+    #returns a solution answering for the given number of turns, solving only if none is kept or in progress
+    def __solution(self, key, board, index, names, lineup, turns):
+        with self.__lock:
+            solution = self.__solutions.get((key, names))
+            if solution is not None and solution.hasTurn(turns):
+                self.__solutions.move_to_end((key, names))
+                self.counters['answered'] += 1
+                return solution
+            future = self.__pending.get((key, names, turns))
+            owner = future is None
+            if owner:
+                future = Future()
+                self.__pending[(key, names, turns)] = future
+                self.counters['solved'] += 1
+            else:
+                self.counters['coalesced'] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            solution = solver.solve(board, lineup, turns, index, self.backend, tolerance=self.tolerance,
+                                    cache=self.cache)
+        except Exception as err:
+            with self.__lock:
+                del self.__pending[(key, names, turns)]
+            future.set_exception(err)
+            raise
+        #the solution is kept in the same step that ends the solve, so no request can miss both
+        with self.__lock:
+            del self.__pending[(key, names, turns)]
+            kept = self.__solutions.get((key, names))
+            if kept is None or kept.turns < solution.turns:
+                self.__keep((key, names), solution)
+            elif (key, names) in self.__solutions:
+                self.__solutions.move_to_end((key, names))
+        future.set_result(solution)
+        return solution
+
+    #keeps a solution as the most recently used, dropping the least recently used ones until the kept
+    #solutions fit within both bounds; must be called holding the lock
+    def __keep(self, name, solution):
+        self.__solutions.pop(name, None)
+        self.__solutionBytes.pop(name, None)
+        size = solutionBytes(solution)
+        if size > self.maxSolutionBytes:
+            return
+        self.__solutions[name] = solution
+        self.__solutionBytes[name] = size
+        while len(self.__solutions) > self.maxSolutions or \
+                sum(self.__solutionBytes.values()) > self.maxSolutionBytes:
+            oldest, _ = self.__solutions.popitem(last=False)
+            del self.__solutionBytes[oldest]
+
+    #the total size of the tables of the solutions kept in memory, in bytes
+    @property
+    def keptBytes(self):
+        with self.__lock:
+            return sum(self.__solutionBytes.values())
+
+#returns the size of the tables a solution keeps, in bytes
+def solutionBytes(solution):
+    return solver.tableBytes(solution.expected)+solver.tableBytes(solution.dice)+solver.tableBytes(solution.pointers)
+
+#returns the parameters of a query string with the number of turns and the origin converted to integers
+def queryNumbers(params):
+    params = dict(params)
+    for name, description in (('turns', "the number of turns"), ('origin', "the origin")):
+        if name in params:
+            try:
+                params[name] = int(params[name])
+            except ValueError:
+                raise ValueError(description + " must be a whole number")
+    return params
+
+#Handles the HTTP requests of a SolveServer, each on its own thread
+#POST /boards with a board file uploads it, answering with its id
+#GET /boards/<id> returns a kept board in the board file format
+#POST /solve with {"board": id or board, "lineup": [names], "turns": n, "origin": space} answers with
+#the best character, expected goals and direction choices, as do GET requests to
+#/solve?board=id&lineup=name,name&turns=n&origin=space
+#GET /stats returns the counts of requests answered from memory, solved and coalesced
+class SolveHandler(BaseHTTPRequestHandler):
+    #connections are kept open between requests, so small answers are sent without waiting to fill a packet
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.startswith('/boards/'):
+            self.__answer(lambda: self.server.service.getBoard(url.path[len('/boards/'):])[0].toDict())
+        elif url.path == '/solve':
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            self.__answer(lambda: self.__solve(queryNumbers(params)))
+        elif url.path == '/stats':
+            self.__answer(lambda: dict(self.server.service.counters))
+        else:
+            self.__send(404, {'error': "not found"})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path == '/boards':
+            self.__answer(lambda: {'board': self.server.service.addBoard(self.__body())})
+        elif path == '/solve':
+            self.__answer(lambda: self.__solve(self.__body()))
+        else:
+            self.__send(404, {'error': "not found"})
+
+    #reads the JSON body of the request
+    def __body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'null')
+        if not isinstance(body, dict):
+            raise ValueError("the request body must be a JSON object")
+        return body
+
+    #answers a solve request given as a dict from a JSON body, or from a query string once its numbers
+    #are converted, so that the service checks the types of the values as they were sent
+    def __solve(self, params):
+        lineup = params.get('lineup')
+        if isinstance(lineup, str):
+            lineup = [name.strip() for name in lineup.split(',')]
+        origin = params.get('origin')
+        if 'board' not in params or lineup is None or 'turns' not in params:
+            raise ValueError("a solve needs a board, a lineup and a number of turns")
+        return self.server.service.query(params['board'], lineup, params['turns'], origin)
+
+    #sends the result of the given function, or an error if it raised one; any other failure of the
+    #solver or cache is answered too, so the connection stays usable
+    def __answer(self, answer):
+        try:
+            self.__send(200, answer())
+        except KeyError as err:
+            self.__send(404, {'error': err.args[0] if err.args else "not found"})
+        except (ValueError, TypeError) as err:
+            self.__send(400, {'error': str(err)})
+        except Exception as err:
+            self.__send(500, {'error': "internal error: " + str(err)})
+
+    def __send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    #requests are only logged when the server is verbose
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+#Serves a SolveService over HTTP, answering each connection on its own thread
+class SolveServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service, host=defaultHost, port=defaultPort, verbose=False):
+        #the service answering the requests
+        self.service = service
+        #whether every request is logged
+        self.verbose = verbose
+        super().__init__((host, port), SolveHandler)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve solves of uploaded boards over HTTP as JSON.")
+    parser.add_argument('--host', default=defaultHost,
+                        help="address to listen on; the default only accepts connections from this machine")
+    parser.add_argument('--port', type=int, default=defaultPort)
+    parser.add_argument('--characters', help="JSON file of character definitions to use instead of the defaults")
+    parser.add_argument('--backend', choices=sorted(set(solver.backends)-{'parallel'}))
+    parser.add_argument('--tolerance', type=float,
+                        help="stop solving once no space's gain per turn changes by more than this, "
+                             "extrapolating the remaining turns")
+    parser.add_argument('--cache', metavar='DIR', help="directory of solves to reuse and add to")
+    parser.add_argument('--boards', type=int, default=64, help="number of boards kept in memory")
+    parser.add_argument('--solutions', type=int, default=256, help="number of solutions kept in memory")
+    parser.add_argument('--solution-bytes', type=int, default=defaultSolutionBytes,
+                        help="total size in bytes of the solutions kept in memory")
+    parser.add_argument('--max-turns', type=int, default=defaultMaxTurns,
+                        help="most turns a request may ask for")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args(argv)
+
+    characters = loadCharacters(args.characters) if args.characters else defaultCharacters()
+    service = SolveService(characters, args.backend, SolveCache(args.cache) if args.cache else None,
+                           args.tolerance, args.boards, args.solutions, args.max_turns,
+                           args.solution_bytes)
+    server = SolveServer(service, args.host, args.port, args.verbose)
+    print("Serving on http://{}:{}".format(*server.server_address[:2]))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from batch import parseLineup
+from board import loadBoard
+from dice import defaultCharacters, loadCharacters
+import solver
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#the number of games played together in one batch of array operations
+defaultBatchSize = 1 << 16
+
+#Holds a solved policy as plain arrays, so that it can be sent to worker processes and applied to many
+#games at once: for every number of turns remaining, the best character and where the best walk of each
+#length lands from every space, along with the board's goals and each character's rolls
+class Policy:
+    def __init__(self, solution, origin, turns):
+        if np is None:
+            raise ValueError("simulating games requires NumPy")
+        lastRow = min(turns, solution.solvedTurns)
+        if turns > solution.turns or any(solution.pointers[row] is None for row in range(1, lastRow+1)):
+            raise ValueError("the solution does not keep every turn up to " + str(turns))
+        board = solution.board
+        #the space the games start from and the number of turns they last
+        self.origin = origin
+        self.turns = turns
+        #the expected goals the solve predicts for the games
+        self.expected = solution.getExpected(origin, turns)
+        #the turns a converged solve extrapolates share the tables of the turn it converged on, so each
+        #number of turns remaining is mapped to the row of the tables holding its policy
+        self.rows = np.minimum(np.arange(turns+1), lastRow)
+        #the best character by row and space, or -1 where no character gets any goals
+        self.dice = np.array([np.asarray(solution.dice[row]) for row in range(lastRow+1)], dtype=np.int16)
+        #the space the best walk lands on by row, walk length and starting space, or -1 where none exists,
+        #found by following each walk's first edge to where the rest of the walk lands, so that a game
+        #moves in one lookup whatever its roll
+        distances = max(len(dist) for dist in solution.distributions)
+        offsets = np.array(board.offsets, dtype=np.intp)
+        targets = np.array(board.targets, dtype=np.intp)
+        self.landing = np.full((lastRow+1, distances, board.nodeCount), -1, dtype=np.intp)
+        self.landing[:, 0] = np.arange(board.nodeCount)
+        for row in range(1, lastRow+1):
+            pointers = solution.pointers[row]
+            for distance in range(1, min(distances, len(pointers))):
+                ranks = np.asarray(pointers[distance], dtype=np.intp)
+                nodes = np.flatnonzero(ranks >= 0)
+                self.landing[row, distance, nodes] = self.landing[row, distance-1,
+                                                                  targets[offsets[nodes]+ranks[nodes]]]
+        self.goals = np.array(board.goals, dtype=np.int64)
+        #the cumulative probability of rolling each total or less by character, each character's
+        #probabilities raised by twice its index so that every roll is drawn with one sorted search
+        self.cumulative = np.zeros((len(solution.distributions), distances))
+        for characterInd, dist in enumerate(solution.distributions):
+            weights = np.array(dist, dtype=float)
+            self.cumulative[characterInd, :len(dist)] = np.cumsum(weights)/weights.sum()
+            #the highest roll takes up any rounding error, so no draw falls past it
+            self.cumulative[characterInd, len(dist)-1:] = 1.0
+            self.cumulative[characterInd] += 2*characterInd
+        self.cumulative = self.cumulative.ravel()
+        self.distances = distances
+
+    #plays the given number of games following the policy, returning how many of them landed on each
+    #number of goals
+    #every game rolls for its chosen character and moves along the best walk of that length; a game ends
+    #early where no walk of the roll's length exists or no character can reach another goal, which is
+    #where the solve counts no more goals either
+    def play(self, games, rng):
+        nodes = np.full(games, self.origin, dtype=np.intp)
+        hits = np.full(games, self.goals[self.origin], dtype=np.int64)
+        playing = np.arange(games)
+        for turns in range(self.turns, 0, -1):
+            row = self.rows[turns]
+            characters = self.dice[row, nodes[playing]]
+            playing = playing[characters >= 0]
+            characters = characters[characters >= 0].astype(np.intp)
+            if not len(playing):
+                break
+            draws = rng.random(len(playing))+2*characters
+            rolls = np.searchsorted(self.cumulative, draws, side='right')-characters*self.distances
+            landed = self.landing[row, np.minimum(rolls, self.distances-1), nodes[playing]]
+            playing = playing[landed >= 0]
+            nodes[playing] = landed[landed >= 0]
+            hits[playing] += self.goals[nodes[playing]]
+        return np.bincount(hits, minlength=self.turns+2)
+
+#The outcome of simulating games that follow a solved policy: how many games landed on each number of
+#goals, along with their mean and its confidence interval, compared against the solve's expectation
+class SimulationResult:
+    def __init__(self, counts, expected, origin, turns, seed, confidence=0.95):
+        #the number of games that landed on each number of goals
+        self.counts = counts
+        #the expected goals the solve predicts
+        self.expected = expected
+        #the space the games started from and the number of turns they lasted
+        self.origin = origin
+        self.turns = turns
+        #the seed the games were played from
+        self.seed = seed
+        #the probability the confidence interval covers the true mean
+        self.confidence = confidence
+        #the number of games played
+        self.games = int(counts.sum())
+        goals = np.arange(len(counts))
+        #the mean and standard deviation of the goals landed on
+        self.mean = float((goals*counts).sum()/self.games)
+        self.std = float(math.sqrt(max((goals*goals*counts).sum()/self.games-self.mean*self.mean, 0.0)))
+
+    #the standard error of the mean
+    @property
+    def stdErr(self):
+        return self.std/math.sqrt(self.games)
+
+    #the bounds of the confidence interval of the mean
+    @property
+    def interval(self):
+        margin = NormalDist().inv_cdf((1+self.confidence)/2)*self.stdErr
+        return self.mean-margin, self.mean+margin
+
+    #how far the simulated mean is from the solve's expectation
+    @property
+    def disagreement(self):
+        return self.mean-self.expected
+
+    #whether the solve's expectation lies in the confidence interval
+    @property
+    def agrees(self):
+        low, high = self.interval
+        return low <= self.expected <= high
+
+    #returns the probability of landing on at least the given number of goals
+    def atLeast(self, goals):
+        return float(self.counts[goals:].sum()/self.games)
+
+    #produces the result as plain dicts and lists, ready to be written as JSON
+    def toDict(self):
+        low, high = self.interval
+        return {'origin': self.origin, 'turns': self.turns, 'games': self.games, 'seed': self.seed,
+                'counts': [int(count) for count in self.counts], 'mean': self.mean, 'std': self.std,
+                'stdErr': self.stdErr, 'confidence': self.confidence, 'interval': [low, high],
+                'expected': self.expected, 'disagreement': self.disagreement, 'agrees': self.agrees}
+
+    #produces a short human readable summary of the result
+    def describe(self):
+        low, high = self.interval
+        lines = ["Simulated " + str(self.games) + " games of " + str(self.turns) + " turns: " +
+                 "{:.4f}".format(self.mean) + " goal squares on average (" + "{:g}".format(self.confidence*100) +
+                 "% interval " + "{:.4f}".format(low) + " to " + "{:.4f}".format(high) + ")",
+                 "Solved expectation " + "{:.4f}".format(self.expected) + ", off by " +
+                 "{:.4f}".format(self.disagreement) + (" (within the interval)" if self.agrees else
+                                                       " (OUTSIDE the interval)")]
+        for goals, count in enumerate(self.counts):
+            if count:
+                lines.append(str(goals) + " goals: " + "{:.4f}".format(count/self.games))
+        return "\n".join(lines)
+
+#the policy games are played with in this process
+workerPolicy = None
+
+#prepares a process to play games with the given policy
+def initWorker(policy):
+    global workerPolicy
+    workerPolicy = policy
+
+#plays one batch of games from its own seed
+def playBatch(games, seedSequence):
+    return workerPolicy.play(games, np.random.default_rng(seedSequence))
+
+#plays games from the given space following a solution's policy for the given number of turns (the
+#solution's own by default), which must have been solved keeping every turn
+#the games are split into batches that each draw from their own stream of the seed, so the result only
+#depends on the seed and the batch size, whatever the number of worker processes
+#workers sets the number of processes, where 1 plays every batch in this process
+def simulate(solution, games, origin=None, turns=None, seed=0, workers=1, batchSize=defaultBatchSize,
+             confidence=0.95):
+    if origin is None:
+        origin = solution.board.origin
+    if origin is None:
+        raise ValueError("the board has no origin")
+    if turns is None:
+        turns = solution.turns
+    if games < 1:
+        raise ValueError("at least one game must be played")
+    policy = Policy(solution, origin, turns)
+    sizes = [min(batchSize, games-start) for start in range(0, games, batchSize)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes)), initializer=initWorker,
+                                 initargs=(policy,)) as executor:
+            batches = list(executor.map(playBatch, sizes, seeds))
+    else:
+        initWorker(policy)
+        batches = [playBatch(size, seedSequence) for size, seedSequence in zip(sizes, seeds)]
+    return SimulationResult(sum(batches), policy.expected, origin, turns, seed, confidence)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play games following the solved policy of a board file.")
+    parser.add_argument('board', help="board file")
+    parser.add_argument('--lineup', required=True, help="comma separated character names")
+    parser.add_argument('--turns', type=int, required=True)
+    parser.add_argument('--origin', type=int, help="space the games start from; the board's origin by default")
+    parser.add_argument('--games', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help="number of worker processes")
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--characters', help="JSON file of character definitions to use instead of the defaults")
+    parser.add_argument('--backend', choices=sorted(solver.backends))
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    characters = loadCharacters(args.characters) if args.characters else defaultCharacters()
+    charactersMap = {character.name: character for character in characters}
+    try:
+        lineup = parseLineup(args.lineup, charactersMap)
+    except ValueError as err:
+        parser.error(str(err))
+    if args.turns < 1:
+        parser.error("the number of turns must be at least 1")
+    board = loadBoard(args.board)
+    solution = solver.solve(board, lineup, args.turns, backend=args.backend)
+    result = simulate(solution, args.games, args.origin, seed=args.seed, workers=args.workers,
+                      confidence=args.confidence)
+    print(json.dumps(result.toDict()) if args.json else result.describe())
+    return 0 if result.agrees else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1164 @@
+import csv
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import weakref
+from array import array
+from dice import genDistributions, lineupDistributions
+from stats import NoStats
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#the version of the tables a solve produces, to be raised whenever a change alters them, which keeps
+#solves cached by an older version from being reused
+solverVersion = 1
+
+#returns the smallest array typecode holding every integer from -1 up to maxValue
+def smallIntType(maxValue):
+    if maxValue < 2**7:
+        return 'b'
+    if maxValue < 2**15:
+        return 'h'
+    return 'i'
+
+#returns a copy of a table of values, which may be an array, a NumPy array or a list of either
+def copyTable(table):
+    if isinstance(table, array):
+        return array(table.typecode, table)
+    if np is not None and isinstance(table, np.ndarray):
+        return table.copy()
+    return [None if row is None else copyTable(row) for row in table]
+
+#returns the change in value of each space from one table to the next, in the same kind of table
+def tableDifference(table, previous):
+    if isinstance(table, array):
+        return array('d', [value-prevValue for value, prevValue in zip(table, previous)])
+    return table-previous
+
+#returns the largest absolute difference between two tables of values
+def largestDifference(table, previous):
+    if isinstance(table, array):
+        return max([abs(value-prevValue) for value, prevValue in zip(table, previous)], default=0.0)
+    return float(np.abs(table-previous).max(initial=0.0))
+
+#whether two tables of values hold the same values
+def tablesEqual(table, other):
+    if np is not None and isinstance(table, np.ndarray):
+        return np.array_equal(table, other)
+    if isinstance(table, list):
+        return len(table) == len(other) and all(
+            (row is None and otherRow is None) or (row is not None and otherRow is not None and
+                                                   tablesEqual(row, otherRow))
+            for row, otherRow in zip(table, other))
+    return table == other
+
+#returns the number of bytes held by a table of values, which may be an array, a NumPy array or a list of either
+def tableBytes(table):
+    if isinstance(table, array):
+        return table.itemsize*len(table)
+    if np is not None and isinstance(table, np.ndarray):
+        return table.nbytes
+    return sum(tableBytes(row) for row in table if row is not None)
+
+#reorders the spaces of a table of values, where sources holds the old position of each space,
+#or -1 for a new space which is given the fill value
+def remapTable(table, sources, fill):
+    if isinstance(table, array):
+        return array(table.typecode, [table[source] if source >= 0 else fill for source in sources])
+    if np is not None and isinstance(table, np.ndarray):
+        sources = np.array(sources, dtype=np.intp)
+        out = table[..., np.maximum(sources, 0)]
+        out[..., sources < 0] = fill
+        return out
+    return [None if row is None else remapTable(row, sources, fill) for row in table]
+
+#The result of a solve: the expected number of goals, the best character and the best
+#choices for each roll, for every space on the board and every number of turns
+#a rolling-window solve only keeps the last two turns of values and the last turn's direction
+#choices, leaving None in place of the turns it dropped
+#a solve that converged keeps the tables up to the turn it converged on, after which every space
+#gains the same number of goals each turn and keeps the same choices
+class Solution:
+    def __init__(self, board, lineup, distributions, expected, dice, pointers):
+        #the board that was solved
+        self.board = board
+        #the characters that could be chosen
+        self.lineup = lineup
+        #the distribution of rolls for each character in the lineup
+        self.distributions = distributions
+        #the number of turns solved for
+        self.turns = len(expected)-1
+        #the expected number of goals, indexed by turns remaining and then space
+        self.expected = expected
+        #the index of the best character, indexed by turns remaining and then space,
+        #or -1 where no character gets any goals
+        self.dice = dice
+        #which of its neighbors each space moves to first on the best walk of each length, indexed
+        #by turns remaining, then distance and then space, or -1 where no walk of that length exists
+        self.pointers = pointers
+        #the turn the solve converged on, after which the values grow linearly, or None
+        self.steadyTurn = None
+        #the expected goals each space gains per turn after the solve converged, or None
+        self.gains = None
+
+    #the number of turns computed, which is less than turns once the solve converged
+    @property
+    def solvedTurns(self):
+        return len(self.expected)-1
+
+    #answers every number of turns up to the given one from the last turn computed, whose values
+    #grow by the given gains every turn from then on
+    def extrapolate(self, turns, gains):
+        self.steadyTurn = self.solvedTurns
+        self.gains = gains
+        self.turns = max(turns, self.steadyTurn)
+
+    #adds the results of one more turn, dropping the turns a rolling-window solve no longer needs
+    def addTurn(self, expected, dice, pointers, history=True):
+        self.expected.append(expected)
+        self.dice.append(dice)
+        self.pointers.append(pointers)
+        self.turns += 1
+        if not history:
+            self.pointers[-2] = None
+            if self.turns >= 2:
+                self.expected[-3] = None
+                self.dice[-3] = None
+
+    #whether the values and choices for the given number of turns were kept; a rolling-window solve
+    #keeps the values of the turn before its last, but not its choices, so that turn is left out
+    #no turns remaining have no choices to keep
+    def hasTurn(self, turns):
+        if self.steadyTurn is not None and self.steadyTurn < turns <= self.turns:
+            return True
+        return 0 <= turns <= self.solvedTurns and self.expected[turns] is not None and \
+            (turns == 0 or self.pointers[turns] is not None)
+
+    #returns the position in the given table holding the given number of turns, raising an error
+    #if it was dropped by a rolling-window solve
+    def __tableTurn(self, turns, table):
+        if self.steadyTurn is not None and self.steadyTurn < turns <= self.turns:
+            turns = self.steadyTurn
+        if not 0 <= turns <= self.solvedTurns or table[turns] is None:
+            raise ValueError("the solution does not keep " + str(turns) + " turns")
+        return turns
+
+    #returns the expected number of goals landed on from the given space
+    def getExpected(self, node, turns=None):
+        if turns is None:
+            turns = self.turns
+        value = self.expected[self.__tableTurn(turns, self.expected)][node]
+        if self.steadyTurn is not None and turns > self.steadyTurn:
+            value += (turns-self.steadyTurn)*self.gains[node]
+        #without a best character the value is a whole number of goals, as in the original solver
+        if self.getDice(node, turns) is None:
+            return int(value)
+        return float(value)
+
+    #returns the expected goals the given space gains per turn in the long run: the gain once the solve
+    #converged, or otherwise the gain of the last turn computed
+    def getGainRate(self, node):
+        if self.gains is not None:
+            return float(self.gains[node])
+        self.__tableTurn(self.solvedTurns-1, self.expected)
+        return float(self.expected[self.solvedTurns][node]-self.expected[self.solvedTurns-1][node])
+
+    #returns the index in the lineup of the best character to choose at the given space
+    def getDice(self, node, turns=None):
+        if turns is None:
+            turns = self.turns
+        characterInd = self.dice[self.__tableTurn(turns, self.dice)][node]
+        if characterInd < 0:
+            return None
+        return int(characterInd)
+
+    #returns (roll, choices) pairs for each roll that requires choosing a direction
+    def getRollChoices(self, node, turns=None):
+        if turns is None:
+            turns = self.turns
+        characterInd = self.getDice(node, turns)
+        if characterInd is None:
+            return []
+        pointers = self.pointers[self.__tableTurn(turns, self.pointers)]
+        out = []
+        for roll, dens in enumerate(self.distributions[characterInd]):
+            if dens:
+                choices = self.__walkChoices(node, roll, pointers)
+                if choices:
+                    out.append((roll, choices))
+        return out
+
+    #follows the back-pointers of the best walk of the given length, collecting its direction labels
+    def __walkChoices(self, node, roll, pointers):
+        choices = ()
+        for distance in range(roll, 0, -1):
+            rank = int(pointers[distance][node])
+            if rank < 0:
+                return ()
+            edge = self.board.offsets[node]+rank
+            label = self.board.labels[edge]
+            if label:
+                choices += (label,)
+            node = self.board.targets[edge]
+        return choices
+
+    #produces a description of the best course of action from the given space
+    def describe(self, node, turns=None):
+        if turns is None:
+            turns = self.turns
+        characterInd = self.getDice(node, turns)
+        if characterInd is None:
+            characterInd = 0
+        bestCharacterStr = self.lineup[characterInd].name
+        expectedValueStr = str(self.getExpected(node, turns))
+
+        resultStr = "Best character: " + bestCharacterStr + " with " + expectedValueStr + " goal squares after " + str(turns) + " turns"
+        for roll, choices in self.getRollChoices(node, turns):
+            resultStr += "\nOn " + str(roll) + " roll: " + choices[0]
+            for choice in choices[1:]:
+                resultStr += ", " + choice
+        if self.steadyTurn is not None and turns > self.steadyTurn:
+            resultStr += "\nConverged after " + str(self.steadyTurn) + " turns, gaining " + \
+                str(self.getGainRate(node)) + " goal squares per turn"
+        return resultStr
+
+    #the numbers of turns the solution can answer for from its tables, in increasing order; the turns
+    #between the one a solve converged on and the last one are left out, as they are extrapolated
+    @property
+    def keptTurns(self):
+        out = [turns for turns in range(self.solvedTurns+1) if self.hasTurn(turns)]
+        if self.turns > self.solvedTurns:
+            out.append(self.turns)
+        return out
+
+    #returns the expected number of goals from every space, in board order
+    def getValues(self, turns=None):
+        return [self.getExpected(node, turns) for node in range(self.board.nodeCount)]
+
+    #returns the kept turns as NumPy arrays: 'turns' lists the numbers of turns, while 'expected' and
+    #'dice' hold a row of values and best character indices (-1 for none) for each of them, and
+    #'steadyTurn' and 'gains' give the turn the solve converged on and the gain per turn of each
+    #space, or -1 and an empty array if it did not converge
+    def toArrays(self):
+        if np is None:
+            raise ValueError("exporting arrays requires NumPy")
+        turnsList = self.keptTurns
+        expected = np.empty((len(turnsList), self.board.nodeCount))
+        dice = np.empty((len(turnsList), self.board.nodeCount), dtype=np.int16)
+        for row, turns in enumerate(turnsList):
+            tableTurns = self.__tableTurn(turns, self.expected)
+            expected[row] = self.expected[tableTurns]
+            dice[row] = self.dice[tableTurns]
+            if turns > tableTurns:
+                expected[row] += (turns-tableTurns)*np.asarray(self.gains, dtype=float)
+        return {'turns': np.array(turnsList), 'expected': expected, 'dice': dice,
+                'steadyTurn': np.array(-1 if self.steadyTurn is None else self.steadyTurn),
+                'gains': np.asarray(self.gains if self.gains is not None else [], dtype=float)}
+
+    #writes the arrays of toArrays to a NumPy .npz file
+    def saveArrays(self, path):
+        np.savez(path, **self.toArrays())
+
+    #writes a CSV file with a row for every space and kept number of turns, giving the expected
+    #number of goals, the best character and the direction choices for each roll
+    def saveCsv(self, path):
+        with open(path, 'w', newline='') as csvFile:
+            writer = csv.writer(csvFile)
+            writer.writerow(['turns', 'space', 'x', 'y', 'goal', 'expected', 'character', 'choices'])
+            for turns in self.keptTurns:
+                for node in range(self.board.nodeCount):
+                    characterInd = self.getDice(node, turns)
+                    choices = "; ".join(str(roll) + ": " + ", ".join(labels)
+                                        for roll, labels in self.getRollChoices(node, turns))
+                    writer.writerow([turns, node, self.board.xs[node], self.board.ys[node],
+                                     self.board.goals[node], self.getExpected(node, turns),
+                                     self.lineup[characterInd].name if characterInd is not None else '',
+                                     choices])
+
+#Records, for every distance, which spaces have a walk of exactly that length and which of their
+#edges can start one; this only depends on the graph, so it is shared by every turn and every
+#solve until an edge is added or removed
+class ReachIndex:
+    def __init__(self, board, maxRoll=0):
+        #the graph the index was built for
+        self.nodeCount = board.nodeCount
+        self.offsets = array('i', board.offsets)
+        self.targets = array('i', board.targets)
+        #the spaces with a walk of each length
+        self.layerNodes = [array('i', range(self.nodeCount))]
+        #the typecode of the arrays holding the position of an edge among its space's neighbors
+        self.rankType = smallIntType(max([self.offsets[node+1]-self.offsets[node]
+                                          for node in range(self.nodeCount)], default=0))
+        #the start of each listed space's edges in layerRanks, for each length
+        self.layerStarts = [None]
+        #the edges that start a walk of each length, given as positions among their space's
+        #neighbors and grouped by space in tie-breaking order
+        self.layerRanks = [None]
+        #the space at the end of each edge in layerRanks
+        self.layerTargets = [None]
+        #the spaces with exactly one neighbor, whose walks are forced, and the neighbor each one leads to
+        #runs of them are corridors, which walks pass straight through without choosing a direction
+        self.forcedNodes = array('i', [node for node in range(self.nodeCount)
+                                       if self.offsets[node+1]-self.offsets[node] == 1])
+        self.forcedTargets = array('i', [self.targets[self.offsets[node]] for node in self.forcedNodes])
+        #whether each space has a walk of the longest length indexed so far
+        self.__feasible = bytearray([1])*self.nodeCount
+        #the layers converted to NumPy arrays, filled in as they are requested
+        self.__arrays = [None]
+        #the layers restricted to the spaces with a choice of direction, as NumPy arrays
+        self.__branchArrays = [None]
+        #the position of each space in each layer, or -1, filled in as they are requested
+        self.__positions = [None]
+        #guards extending the index, which background solves may share
+        self.__lock = threading.Lock()
+        self.ensure(maxRoll)
+
+    #the longest walk length indexed so far
+    @property
+    def maxRoll(self):
+        return len(self.layerNodes)-1
+
+    #whether the index was built for the same graph as the given board
+    def matches(self, board):
+        return self.offsets == board.offsets and self.targets == board.targets
+
+    #extends the index to cover walks up to the given length
+    def ensure(self, maxRoll):
+        with self.__lock:
+            self.__extend(maxRoll)
+
+    def __extend(self, maxRoll):
+        offsets = self.offsets
+        targets = self.targets
+        while self.maxRoll < maxRoll:
+            prevFeasible = self.__feasible
+            feasible = bytearray(self.nodeCount)
+            nodes = array('i')
+            starts = array('i', [0])
+            ranks = array(self.rankType)
+            edgeTargets = array('i')
+            for node in range(self.nodeCount):
+                #the last neighbor is preferred on ties, matching the original depth-first search
+                for edge in range(offsets[node+1]-1, offsets[node]-1, -1):
+                    if prevFeasible[targets[edge]]:
+                        ranks.append(edge-offsets[node])
+                        edgeTargets.append(targets[edge])
+                if len(ranks) != starts[-1]:
+                    feasible[node] = 1
+                    nodes.append(node)
+                    starts.append(len(ranks))
+            self.layerNodes.append(nodes)
+            self.layerStarts.append(starts)
+            self.layerRanks.append(ranks)
+            self.layerTargets.append(edgeTargets)
+            self.__arrays.append(None)
+            self.__branchArrays.append(None)
+            self.__positions.append(None)
+            self.__feasible = feasible
+
+    #returns the position of each space in the layer of the given length, or -1 if it has no walk that long
+    def positions(self, distance):
+        with self.__lock:
+            if self.__positions[distance] is None:
+                positions = array('i', [-1])*self.nodeCount
+                for pos, layerNode in enumerate(self.layerNodes[distance]):
+                    positions[layerNode] = pos
+                self.__positions[distance] = positions
+            return self.__positions[distance]
+
+    #returns the spaces, segment starts, edge ranks and edge targets of a layer as NumPy arrays
+    def arrays(self, distance):
+        with self.__lock:
+            return self.__layerArrays(distance)
+
+    #returns the same arrays as arrays(), leaving out the spaces with a single neighbor
+    #the segment starts are given for the remaining spaces, which keep their order
+    def branchArrays(self, distance):
+        with self.__lock:
+            if self.__branchArrays[distance] is None:
+                nodes, starts, ranks, edgeTargets = self.__layerArrays(distance)
+                offsets = np.array(self.offsets, dtype=np.intp)
+                branching = (offsets[nodes+1]-offsets[nodes]) > 1
+                lengths = np.diff(np.append(starts, len(ranks)))[branching]
+                keptStarts = np.cumsum(lengths)-lengths
+                edges = np.arange(lengths.sum())-np.repeat(keptStarts-starts[branching], lengths)
+                self.__branchArrays[distance] = (nodes[branching], keptStarts, ranks[edges], edgeTargets[edges])
+            return self.__branchArrays[distance]
+
+    def __layerArrays(self, distance):
+        if self.__arrays[distance] is None:
+            self.__arrays[distance] = (
+                np.array(self.layerNodes[distance], dtype=np.intp),
+                np.array(self.layerStarts[distance][:-1], dtype=np.intp),
+                np.array(self.layerRanks[distance], dtype=self.rankType),
+                np.array(self.layerTargets[distance], dtype=np.intp)
+            )
+        return self.__arrays[distance]
+
+#finds the best value that can be landed on by a walk of each exact length from every space
+#bestLayers[d][i] holds the best previous turn value at the end of a walk of length d from space i,
+#and pointers[d][i] which neighbor that walk moves to first; walks reaching the same space at the same
+#distance are merged, so the cost is proportional to edges times the maximum roll
+#ties go to the neighbor listed last, the same walk the original depth-first search found first
+def bestWalks(index, values, maxRoll):
+    nodeCount = index.nodeCount
+
+    bestLayers = [values]
+    pointers = [None]
+    for distance in range(1, maxRoll+1):
+        prevLayer = bestLayers[-1]
+        layer = array('d', [float("-inf")])*nodeCount
+        layerPointers = array(index.rankType, [-1])*nodeCount
+        starts = index.layerStarts[distance]
+        ranks = index.layerRanks[distance]
+        edgeTargets = index.layerTargets[distance]
+        for pos, node in enumerate(index.layerNodes[distance]):
+            best = float("-inf")
+            for ind in range(starts[pos], starts[pos+1]):
+                candidate = prevLayer[edgeTargets[ind]]
+                if candidate > best:
+                    best = candidate
+                    layerPointers[node] = ranks[ind]
+            layer[node] = best
+        bestLayers.append(layer)
+        pointers.append(layerPointers)
+    return bestLayers, pointers
+
+#finds the expected goals from a space given the best values of walks of each length from it,
+#and the index of the best character to choose, or -1 if no character gets any goals
+def nodeValue(bestLayers, node, distributions, isGoal):
+    maxExpected = 0
+    bestDice = -1
+    for diceInd, dist in enumerate(distributions):
+        expectedValue = 0
+        totalDensity = 0
+        for ind, dens in enumerate(dist):
+            safeExpected = bestLayers[ind][node]
+            if safeExpected == float("-inf"):
+                safeExpected = 0
+            expectedValue += safeExpected * dens
+            totalDensity += dens
+        expectedValue /= totalDensity
+        if expectedValue > maxExpected:
+            maxExpected = expectedValue
+            bestDice = diceInd
+    if isGoal:
+        maxExpected += 1
+    return maxExpected, bestDice
+
+#records the work done by one turn: the edges followed to extend walks, the walk states (a space and
+#a walk length) they reached, where every walk beyond the first to reach a state is merged into it,
+#and the spaces whose expected goals were computed
+def countStep(stats, edgeCount, stateCount, valueCount):
+    stats.count('walkEdges', edgeCount)
+    stats.count('walkStates', stateCount)
+    stats.count('walksMerged', edgeCount-stateCount)
+    stats.count('spaceValues', valueCount)
+
+#finds the expected goals of each column of best walk values, one row per walk length, and the index of
+#the best character to choose, or -1 if no character gets any goals
+#weights holds each character's roll distribution padded to the maximum roll, totals their sums and
+#rolls the rolls at least one character can make; every backend working on NumPy arrays sums in this
+#order, so their results are bit for bit equal to PythonBackend's whichever spaces they compute at once
+def spaceValues(bestLayers, weights, totals, rolls, goals):
+    safeLayers = np.where(bestLayers == -np.inf, 0.0, bestLayers)
+    values = np.zeros((len(totals), safeLayers.shape[1]))
+    for roll in rolls:
+        values += np.outer(weights[:, roll], safeLayers[roll])
+    values /= totals[:, None]
+    maxExpected = values.max(axis=0)
+    improved = maxExpected > 0
+    curDice = np.where(improved, values.argmax(axis=0), -1).astype(smallIntType(len(totals)))
+    curExpected = np.where(improved, maxExpected, 0.0) + goals
+    return curExpected, curDice
+
+#finds the best of each segment of candidate walk values, returning the best values and the rank of the edge
+#reaching each, given the start of each segment and the rank of each candidate's edge; the first edge of
+#each segment reaching the maximum wins ties, so every backend working on NumPy arrays merges walks alike
+def segmentBest(candidates, starts, ranks):
+    segmentMax = np.maximum.reduceat(candidates, starts)
+    counts = np.diff(np.append(starts, len(candidates)))
+    positions = np.where(candidates == np.repeat(segmentMax, counts), np.arange(len(candidates)), len(candidates))
+    return segmentMax, ranks[np.minimum.reduceat(positions, starts)]
+
+#returns the positions of the entries of the given rows of a CSR table with the given offsets, concatenated,
+#along with the start of each row's entries among them and their number
+#with reverse, each row's entries are listed last first, the tie-breaking order of the edges of a space
+def gatherRows(offsets, rows, reverse=False):
+    begins = offsets[rows]
+    lengths = offsets[rows+1]-begins
+    outStarts = np.cumsum(lengths)-lengths
+    flat = np.arange(lengths.sum())-np.repeat(outStarts-begins, lengths)
+    if reverse:
+        flat = np.repeat(2*begins+lengths-1, lengths)-flat
+    return flat, outStarts, lengths
+
+#Computes each turn with plain Python arrays
+class PythonBackend:
+    #the share of the board that may change on a turn before an incremental solve recomputes the whole turn
+    fullStepFraction = 1.0
+
+    def __init__(self, board, index, distributions, maxRoll, stats=None):
+        self.board = board
+        self.index = index
+        self.goals = board.goals
+        self.distributions = distributions
+        self.maxRoll = maxRoll
+        #where the operations of each turn are recorded
+        self.stats = stats or NoStats()
+        #the number of edges followed and walk states found by a full turn
+        self.stepEdges = sum(len(index.layerTargets[distance]) for distance in range(1, maxRoll+1))
+        self.stepStates = sum(len(index.layerNodes[distance]) for distance in range(1, maxRoll+1))
+
+    #the values of every space before any turns are taken
+    def initial(self):
+        return array('d', list(self.goals))
+
+    #computes the expected goals, best character and walk back-pointers for one more turn
+    #given the expected goals of every space with one turn fewer, along with the best walk values
+    def step(self, previous):
+        nodeCount = self.index.nodeCount
+        with self.stats.phase('walks'):
+            bestLayers, pointers = bestWalks(self.index, previous, self.maxRoll)
+        with self.stats.phase('values'):
+            curExpected = array('d', [0])*nodeCount
+            curDice = array(smallIntType(len(self.distributions)), [-1])*nodeCount
+            for node in range(nodeCount):
+                curExpected[node], curDice[node] = nodeValue(bestLayers, node, self.distributions,
+                                                             self.goals[node])
+        countStep(self.stats, self.stepEdges, self.stepStates, nodeCount)
+        return curExpected, curDice, pointers, bestLayers
+
+    #recomputes one turn from the tables of an earlier solve, given the expected goals with one turn fewer,
+    #the set of spaces whose value changed on that turn and the set of spaces to recompute on every turn
+    #returns the new tables, as step does, and the set of spaces whose value changed
+    def update(self, previous, prevChanged, seeds, oldExpected, oldDice, oldPointers, oldLayers):
+        expected = copyTable(oldExpected)
+        dice = copyTable(oldDice)
+        pointers = copyTable(oldPointers)
+        layers = copyTable(oldLayers)
+        layers[0] = previous
+
+        valueNodes = seeds | prevChanged
+        changedLayer = prevChanged
+        edgeCount = 0
+        stateCount = 0
+        with self.stats.phase('walks'):
+            for distance in range(1, self.maxRoll+1):
+                candidates = set(seeds)
+                for node in changedLayer:
+                    candidates.update(self.board.parents(node))
+                if not candidates:
+                    break
+                positions = self.index.positions(distance)
+                starts = self.index.layerStarts[distance]
+                ranks = self.index.layerRanks[distance]
+                edgeTargets = self.index.layerTargets[distance]
+                prevLayer = layers[distance-1]
+                layer = layers[distance]
+                layerPointers = pointers[distance]
+                changedLayer = set()
+                for node in candidates:
+                    pos = positions[node]
+                    best = float("-inf")
+                    bestRank = -1
+                    if pos >= 0:
+                        stateCount += 1
+                        edgeCount += starts[pos+1]-starts[pos]
+                        for ind in range(starts[pos], starts[pos+1]):
+                            candidate = prevLayer[edgeTargets[ind]]
+                            if candidate > best:
+                                best = candidate
+                                bestRank = ranks[ind]
+                    if best != layer[node]:
+                        layer[node] = best
+                        changedLayer.add(node)
+                    layerPointers[node] = bestRank
+                valueNodes |= changedLayer
+
+        with self.stats.phase('values'):
+            changed = set()
+            for node in valueNodes:
+                value, dice[node] = nodeValue(layers, node, self.distributions, self.goals[node])
+                if value != expected[node]:
+                    expected[node] = value
+                    changed.add(node)
+        countStep(self.stats, edgeCount, stateCount, len(valueNodes))
+        return expected, dice, pointers, layers, changed
+
+    #returns the set of spaces whose expected goals differ between two turns
+    def changedNodes(self, expected, oldExpected):
+        return {node for node in range(len(expected)) if expected[node] != oldExpected[node]}
+
+    #releases what the backend holds between turns, which here is nothing
+    def close(self):
+        pass
+
+#Computes each turn with NumPy arrays, over all spaces and characters at once
+#the sums are accumulated in the same order as PythonBackend, so the results are bit for bit equal
+class NumpyBackend:
+    #the share of the board that may change on a turn before an incremental solve recomputes the whole turn
+    fullStepFraction = 0.25
+
+    def __init__(self, board, index, distributions, maxRoll, stats=None):
+        self.board = board
+        self.index = index
+        self.maxRoll = maxRoll
+        #where the operations of each turn are recorded
+        self.stats = stats or NoStats()
+        #the number of edges followed and walk states found by a full turn
+        self.stepEdges = sum(len(index.layerTargets[distance]) for distance in range(1, maxRoll+1))
+        self.stepStates = sum(len(index.layerNodes[distance]) for distance in range(1, maxRoll+1))
+        self.goals = np.array(board.goals, dtype=np.float64)
+        #the stacked distributions, one row per character padded to the maximum roll
+        self.weights = np.zeros((len(distributions), maxRoll+1))
+        for diceInd, dist in enumerate(distributions):
+            self.weights[diceInd, :len(dist)] = dist
+        self.totals = np.array([sum(dist) for dist in distributions], dtype=np.float64)
+        #the rolls at least one character can make
+        self.rolls = [roll for roll in range(maxRoll+1) if self.weights[:, roll].any()]
+        #the corridor spaces follow their only neighbor, so only the spaces with a choice of direction
+        #take the best of their neighbors; the corridor pointers never change between turns
+        self.forcedNodes = np.array(index.forcedNodes, dtype=np.intp)
+        self.forcedTargets = np.array(index.forcedTargets, dtype=np.intp)
+        self.pointerTemplate = np.full((maxRoll+1, index.nodeCount), -1, dtype=index.rankType)
+        for distance in range(1, maxRoll+1):
+            nodes = index.arrays(distance)[0]
+            forced = np.zeros(index.nodeCount, dtype=bool)
+            forced[self.forcedNodes] = True
+            self.pointerTemplate[distance, nodes[forced[nodes]]] = 0
+            index.branchArrays(distance)
+        #the parents of each space and the layer positions, converted when an update first needs them
+        self.__parents = None
+        self.__positions = {}
+
+    #the values of every space before any turns are taken
+    def initial(self):
+        return self.goals.copy()
+
+    #computes the expected goals, best character and walk back-pointers for one more turn
+    #given the expected goals of every space with one turn fewer, along with the best walk values
+    def step(self, previous):
+        nodeCount = self.index.nodeCount
+        with self.stats.phase('walks'):
+            bestLayers = np.full((self.maxRoll+1, nodeCount), -np.inf)
+            bestLayers[0] = previous
+            pointers = self.pointerTemplate.copy()
+            for distance in range(1, self.maxRoll+1):
+                #a corridor space lands wherever its neighbor lands one step sooner, or nowhere if it cannot
+                bestLayers[distance, self.forcedNodes] = bestLayers[distance-1, self.forcedTargets]
+                nodes, starts, ranks, edgeTargets = self.index.branchArrays(distance)
+                if not len(nodes):
+                    continue
+                bestLayers[distance, nodes], pointers[distance, nodes] = segmentBest(
+                    bestLayers[distance-1][edgeTargets], starts, ranks)
+
+        with self.stats.phase('values'):
+            curExpected, curDice = spaceValues(bestLayers, self.weights, self.totals, self.rolls, self.goals)
+        countStep(self.stats, self.stepEdges, self.stepStates, nodeCount)
+        return curExpected, curDice, pointers, bestLayers
+
+    #recomputes one turn from the tables of an earlier solve, given the expected goals with one turn fewer,
+    #the set of spaces whose value changed on that turn and the set of spaces to recompute on every turn
+    #returns the new tables, as step does, and the set of spaces whose value changed
+    def update(self, previous, prevChanged, seeds, oldExpected, oldDice, oldPointers, oldLayers):
+        if self.__parents is None:
+            self.__parents = (np.array(self.board.parentOffsets, dtype=np.intp),
+                              np.array(self.board.sources, dtype=np.intp))
+        expected = oldExpected.copy()
+        dice = oldDice.copy()
+        pointers = oldPointers.copy()
+        layers = oldLayers.copy()
+        layers[0] = previous
+
+        seeds = np.array(sorted(seeds), dtype=np.intp)
+        changedLayer = np.array(sorted(prevChanged), dtype=np.intp)
+        valueMask = np.zeros(self.index.nodeCount, dtype=bool)
+        valueMask[seeds] = True
+        valueMask[changedLayer] = True
+        edgeCount = 0
+        stateCount = 0
+        with self.stats.phase('walks'):
+            for distance in range(1, self.maxRoll+1):
+                parentOffsets, sources = self.__parents
+                candidates = np.union1d(seeds, sources[gatherRows(parentOffsets, changedLayer)[0]])
+                if not len(candidates):
+                    break
+                best, bestRanks, edges = self.__bestEdges(distance, candidates, layers[distance-1])
+                edgeCount += edges
+                stateCount += int(np.count_nonzero(bestRanks >= 0))
+                changedLayer = candidates[best != layers[distance, candidates]]
+                layers[distance, candidates] = best
+                pointers[distance, candidates] = bestRanks
+                valueMask[changedLayer] = True
+
+        with self.stats.phase('values'):
+            nodes = np.flatnonzero(valueMask)
+            newExpected, dice[nodes] = spaceValues(layers[:, nodes], self.weights, self.totals, self.rolls,
+                                                   self.goals[nodes])
+            changed = nodes[newExpected != expected[nodes]]
+            expected[nodes] = newExpected
+        countStep(self.stats, edgeCount, stateCount, len(nodes))
+        return expected, dice, pointers, layers, set(changed.tolist())
+
+    #returns the set of spaces whose expected goals differ between two turns
+    def changedNodes(self, expected, oldExpected):
+        return set(np.flatnonzero(expected != oldExpected).tolist())
+
+    #releases what the backend holds between turns, which here is nothing
+    def close(self):
+        pass
+
+    #finds the best walk values and first moves of the given length for a subset of spaces,
+    #along with the number of edges followed
+    def __bestEdges(self, distance, nodes, prevLayer):
+        if distance not in self.__positions:
+            self.__positions[distance] = (np.array(self.index.positions(distance), dtype=np.intp),
+                                          np.array(self.index.layerStarts[distance], dtype=np.intp))
+        positions, starts = self.__positions[distance]
+        _, _, ranks, edgeTargets = self.index.arrays(distance)
+        best = np.full(len(nodes), -np.inf)
+        bestRanks = np.full(len(nodes), -1, dtype=self.index.rankType)
+        present = positions[nodes] >= 0
+        edgeCount = 0
+        if present.any():
+            edges, segStarts, _ = gatherRows(starts, positions[nodes[present]])
+            edgeCount = len(edges)
+            best[present], bestRanks[present] = segmentBest(prevLayer[edgeTargets[edges]], segStarts, ranks[edges])
+        return best, bestRanks, edgeCount
+
+#Computes each turn with NumPy arrays across worker processes, each solving a contiguous shard of the
+#spaces, so that boards with thousands of spaces use every core
+#a space's values depend only on the previous turn's values within a roll of it, so each worker also
+#follows the walks of the spaces its shard can reach within a roll, and the workers only wait for each
+#other once per turn; the graph, the previous turn's values and every table a turn produces are kept in
+#shared memory, which the workers read and write in place
+#the walks and values are computed as in NumpyBackend, so the results are bit for bit equal to it
+#shards follow the order of the spaces, so they share the least work on boards that number nearby
+#spaces together; updates from an earlier solve only touch a few spaces and are computed in this process
+class ParallelBackend(NumpyBackend):
+    #the number of worker processes, or None for one per CPU
+    workers = None
+    #the fewest spaces worth a worker of their own; boards too small for two are solved in this process
+    minShardNodes = 2048
+
+    def __init__(self, board, index, distributions, maxRoll, stats=None):
+        super().__init__(board, index, distributions, maxRoll, stats)
+        workers = self.workers or os.cpu_count() or 1
+        #the number of shards the spaces are split into, one per worker process
+        self.shardCount = max(1, min(workers, index.nodeCount//self.minShardNodes))
+        #the worker processes, their connections and the shared tables, started by the first full turn
+        self.__processes = None
+        self.__connections = None
+        self.__shared = None
+        self.__finalizer = None
+
+    #splits the spaces into contiguous shards with about the same number of edges each,
+    #returning where each shard starts followed by the number of spaces
+    def shardBounds(self):
+        offsets = np.array(self.board.offsets, dtype=np.int64)
+        work = np.cumsum(np.diff(offsets)+1)
+        cuts = np.searchsorted(work, work[-1]*np.arange(1, self.shardCount)/self.shardCount, side='right')
+        return [0]+[int(cut) for cut in cuts]+[self.index.nodeCount]
+
+    #computes one more turn across the workers, or in this process on boards too small to split
+    def step(self, previous):
+        if self.shardCount < 2:
+            return super().step(previous)
+        if self.__processes is None:
+            self.__start()
+        tables = self.__shared
+        with self.stats.phase('shards'):
+            tables['previous'][:] = previous
+            for connection in self.__connections:
+                connection.send(True)
+            errors = [connection.recv() for connection in self.__connections]
+        for error in errors:
+            if error is not None:
+                raise error
+        countStep(self.stats, self.stepEdges, self.stepStates, self.index.nodeCount)
+        return (tables['expected'].copy(), tables['dice'].copy(), tables['pointers'].copy(),
+                tables['layers'].copy())
+
+    #stops the worker processes
+    def close(self):
+        if self.__finalizer is not None:
+            self.__finalizer()
+
+    def __start(self):
+        nodeCount = self.index.nodeCount
+        context = workerContext()
+        diceType = smallIntType(len(self.totals))
+        buffers = {'offsets': context.RawArray('q', len(self.board.offsets)),
+                   'targets': context.RawArray('q', max(len(self.board.targets), 1)),
+                   'goals': context.RawArray('d', nodeCount),
+                   'previous': context.RawArray('d', nodeCount),
+                   'expected': context.RawArray('d', nodeCount),
+                   'dice': context.RawArray(diceType, nodeCount),
+                   'pointers': context.RawArray(self.index.rankType, (self.maxRoll+1)*nodeCount),
+                   'layers': context.RawArray('d', (self.maxRoll+1)*nodeCount)}
+        shapes = sharedShapes(nodeCount, self.maxRoll, len(self.board.targets))
+        self.__shared = sharedTables(buffers, shapes)
+        self.__shared['offsets'][:] = self.board.offsets
+        self.__shared['targets'][:] = self.board.targets
+        self.__shared['goals'][:] = self.goals
+        bounds = self.shardBounds()
+        self.__processes = []
+        self.__connections = []
+        for shard in range(self.shardCount):
+            connection, workerConnection = context.Pipe()
+            process = context.Process(target=sweepShards, daemon=True,
+                                      args=(workerConnection, buffers, shapes, bounds[shard], bounds[shard+1],
+                                            self.weights, self.totals, self.rolls, self.maxRoll))
+            process.start()
+            workerConnection.close()
+            self.__processes.append(process)
+            self.__connections.append(connection)
+        #the workers are stopped with the backend even if it is never closed
+        self.__finalizer = weakref.finalize(self, stopWorkers, self.__processes, self.__connections)
+
+#returns the multiprocessing context worker processes are started with, which never forks them from this
+#process, as it may have other threads holding locks, such as a BackgroundSolve or the server's handlers
+def workerContext():
+    return multiprocessing.get_context(
+        'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+#returns the shape of each table shared with the workers of a ParallelBackend
+def sharedShapes(nodeCount, maxRoll, edgeCount):
+    return {'offsets': (nodeCount+1,), 'targets': (edgeCount,), 'goals': (nodeCount,), 'previous': (nodeCount,),
+            'expected': (nodeCount,), 'dice': (nodeCount,), 'pointers': (maxRoll+1, nodeCount),
+            'layers': (maxRoll+1, nodeCount)}
+
+#returns NumPy arrays reading and writing the shared buffers in place
+def sharedTables(buffers, shapes):
+    tables = {}
+    for name, buffer in buffers.items():
+        size = int(np.prod(shapes[name]))
+        tables[name] = np.ctypeslib.as_array(buffer)[:size].reshape(shapes[name])
+    return tables
+
+#asks the workers of a ParallelBackend to stop and waits for them
+def stopWorkers(processes, connections):
+    for connection in connections:
+        try:
+            connection.send(False)
+        except OSError:
+            pass
+        connection.close()
+    for process in processes:
+        process.join(1)
+        if process.is_alive():
+            process.terminate()
+
+#runs in a worker process of a ParallelBackend, solving the spaces from start up to end every time it
+#is asked to, until it is told to stop
+#the walks the shard needs are found once: every length from the shard itself, and one step shorter
+#from every space those lead to, back to the previous turn's values; as in a ReachIndex, only the edges
+#leading to a walk one step shorter are kept, so the walks are merged exactly as NumpyBackend merges them
+def sweepShards(connection, buffers, shapes, start, end, weights, totals, rolls, maxRoll):
+    tables = sharedTables(buffers, shapes)
+    offsets = tables['offsets']
+    targets = tables['targets']
+    needed = [None]*(maxRoll+1)
+    needed[maxRoll] = np.arange(start, end)
+    for distance in range(maxRoll, 0, -1):
+        mask = np.zeros(len(offsets)-1, dtype=bool)
+        mask[start:end] = True
+        mask[targets[gatherRows(offsets, needed[distance], True)[0]]] = True
+        needed[distance-1] = np.flatnonzero(mask)
+    #the spaces are numbered by their position among all the spaces the shard needs, which keeps the
+    #shard's own spaces together
+    spaces = np.unique(np.concatenate(needed))
+    shardStart = int(np.searchsorted(spaces, start))
+    shard = slice(shardStart, shardStart+end-start)
+    #the first moves of the corridor spaces, which never change between turns
+    pointerTemplate = np.full((maxRoll+1, len(spaces)), -1, dtype=tables['pointers'].dtype)
+    feasible = np.ones(len(spaces), dtype=bool)
+    steps = [None]
+    for distance in range(1, maxRoll+1):
+        prevFeasible = feasible
+        feasible = np.zeros(len(spaces), dtype=bool)
+        nodes = needed[distance]
+        degrees = offsets[nodes+1]-offsets[nodes]
+        forced = np.searchsorted(spaces, nodes[degrees == 1])
+        forcedTargets = np.searchsorted(spaces, targets[offsets[nodes[degrees == 1]]])
+        feasible[forced] = prevFeasible[forcedTargets]
+        pointerTemplate[distance, forced[feasible[forced]]] = 0
+        branching = nodes[degrees > 1]
+        edges, _, lengths = gatherRows(offsets, branching, True)
+        owners = np.repeat(np.arange(len(branching)), lengths)
+        ranks = edges-offsets[branching][owners]
+        edgeTargets = np.searchsorted(spaces, targets[edges])
+        kept = prevFeasible[edgeTargets]
+        counts = np.bincount(owners[kept], minlength=len(branching))
+        branching = np.searchsorted(spaces, branching[counts > 0])
+        feasible[branching] = True
+        steps.append((forced, forcedTargets, branching, (np.cumsum(counts)-counts)[counts > 0],
+                      ranks[kept].astype(pointerTemplate.dtype), edgeTargets[kept]))
+    goals = tables['goals'][start:end]
+
+    while receive(connection):
+        try:
+            bestLayers = np.full((maxRoll+1, len(spaces)), -np.inf)
+            bestLayers[0] = tables['previous'][spaces]
+            pointers = pointerTemplate.copy()
+            for distance in range(1, maxRoll+1):
+                forced, forcedTargets, branching, starts, ranks, edgeTargets = steps[distance]
+                bestLayers[distance, forced] = bestLayers[distance-1, forcedTargets]
+                if not len(branching):
+                    continue
+                bestLayers[distance, branching], pointers[distance, branching] = segmentBest(
+                    bestLayers[distance-1][edgeTargets], starts, ranks)
+            tables['expected'][start:end], tables['dice'][start:end] = spaceValues(bestLayers[:, shard], weights,
+                                                                                   totals, rolls, goals)
+            tables['pointers'][:, start:end] = pointers[:, shard]
+            tables['layers'][:, start:end] = bestLayers[:, shard]
+            connection.send(None)
+        except Exception as err:
+            connection.send(err)
+
+#waits for the next message from the other end of a connection, taking a closed connection as False
+def receive(connection):
+    try:
+        return connection.recv()
+    except EOFError:
+        return False
+
+#the solver backends by name
+backends = {'python': PythonBackend, 'numpy': NumpyBackend, 'parallel': ParallelBackend}
+
+#the backend used when none is requested: NumPy when it is installed, plain Python otherwise
+def defaultBackend():
+    return 'numpy' if np is not None else 'python'
+
+#Solves boards, keeping the tables of the last solve so that after a few edits the next solve only
+#recomputes the spaces the edits can affect
+#a space's value can only change if it can walk to an edited space, so the changes are followed
+#backwards through the parents of each changed space one distance at a time, and a turn where
+#no values change leaves every later turn unchanged
+#an incremental Solver keeps every turn of the last solve: the expected goals, best characters and
+#direction pointers, along with the best walk values of every length, which take (maxRoll+1)*nodeCount
+#floats per turn, so it cannot be combined with a rolling-window solve
+#a SolveCache may be given to load solves made before from it, and to store each finished solve in it
+class Solver:
+    def __init__(self, backend=None, incremental=True, cache=None):
+        if backend is None:
+            backend = defaultBackend()
+        if backend not in backends:
+            raise ValueError("unknown solver backend: " + str(backend))
+        if backend != 'python' and np is None:
+            raise ValueError("the " + backend + " solver backend requires NumPy")
+        #the name of the backend computing full turns
+        self.backend = backend
+        #whether the tables of each solve are kept for the next one
+        self.incremental = incremental
+        #the keys, distributions, solution and best walk values of the last solve
+        self.__last = None
+        #the on-disk cache of finished solves, if any
+        self.cache = cache
+
+    #discards the tables of the last solve
+    def reset(self):
+        self.__last = None
+
+    #produces the best course of action from every space on the board, one turn at a time
+    #yields the same Solution after each number of turns up to the given one is solved, starting from none,
+    #so that callers can report progress, show the answers so far or stop early
+    #lineup is the list of Characters that may be chosen from on each turn
+    #index may be a ReachIndex kept from an earlier solve of the same graph
+    #unless history is set, only the values of the last two turns and the choices for the last turn are kept,
+    #which an incremental Solver does not allow
+    #dirty lists the spaces whose goal flag or ordered neighbors changed since the last solve, or None to
+    #solve from scratch, and keys identifies each space so that the last solve's tables can follow the
+    #spaces when others are added or removed; without keys the spaces must keep their positions
+    #stats may be a SolveStats to record the operations, timings and table sizes of the solve into
+    #distributions may give the roll distribution of each character in the lineup instead of
+    #rolling the others as its allies, such as when bounding many lineups at once
+    #with a tolerance, the solve stops once no space's gain over a turn changes by more than it and the
+    #choices stay the same, and every later turn is extrapolated from that gain; the last Solution yielded
+    #then answers for the full number of turns
+    def iterSolve(self, board, lineup, turns, index=None, history=True, dirty=None, keys=None, stats=None,
+                  distributions=None, tolerance=None):
+        if self.incremental and not history:
+            raise ValueError("an incremental solver keeps every turn, so it cannot solve without history")
+        stats = stats or NoStats()
+        with stats.phase('distributions'):
+            cacheBefore = lineupDistributions.cache_info()
+            if distributions is None:
+                distributions = genDistributions(lineup)
+            cacheAfter = lineupDistributions.cache_info()
+        stats.count('distributionCacheHits', cacheAfter.hits-cacheBefore.hits)
+        stats.count('distributionCacheMisses', cacheAfter.misses-cacheBefore.misses)
+        maxRoll = max(len(dist) for dist in distributions)-1
+        with stats.phase('index'):
+            if index is None:
+                index = ReachIndex(board)
+            indexedRoll = index.maxRoll
+            index.ensure(maxRoll)
+        stats.count('indexLayersBuilt', max(index.maxRoll-indexedRoll, 0))
+        engine = backends[self.backend](board, index, distributions, maxRoll, stats)
+
+        with stats.phase('reuse'):
+            last = self.__reusable(board, distributions, dirty, keys)
+        #the cache is only worth checking for a solve that would start from scratch
+        useCache = self.cache is not None and history and not last
+        if useCache:
+            with stats.phase('cache'):
+                solution = self.cache.load(board, lineup, distributions, turns, tolerance)
+            if solution is not None:
+                stats.count('solveCacheHits')
+                #a cached solve keeps no best walk values to update from, so the next solve starts over
+                self.__last = None
+                yield solution
+                return
+            stats.count('solveCacheMisses')
+        solution = Solution(board, lineup, distributions, [engine.initial()],
+                            [array(smallIntType(len(distributions)), [-1])*board.nodeCount], [None])
+        layers = [None]
+        yield solution
+
+        if last:
+            oldSolution, oldLayers, seeds = last
+            changed = {node for node in seeds if solution.expected[0][node] != oldSolution.expected[0][node]}
+        #the backend's workers, if any, are stopped when the solve ends or is abandoned
+        try:
+            gains = None
+            for i in range(1, turns+1):
+                start = time.perf_counter()
+                previous = solution.expected[-1]
+                prevDice = solution.dice[-1]
+                prevPointers = solution.pointers[-1]
+                mode = 'full'
+                if last and i <= oldSolution.solvedTurns:
+                    if len(changed)+len(seeds) > board.nodeCount*engine.fullStepFraction:
+                        curExpected, curDice, curPointers, curLayers = engine.step(previous)
+                        changed = engine.changedNodes(curExpected, oldSolution.expected[i])
+                    elif changed or seeds:
+                        curExpected, curDice, curPointers, curLayers, changed = engine.update(
+                            previous, changed, seeds, oldSolution.expected[i], oldSolution.dice[i],
+                            oldSolution.pointers[i], oldLayers[i])
+                        mode = 'updated'
+                    else:
+                        curExpected = oldSolution.expected[i]
+                        curDice = oldSolution.dice[i]
+                        curPointers = oldSolution.pointers[i]
+                        curLayers = oldLayers[i]
+                        mode = 'reused'
+                    stats.count('spacesChanged', len(changed))
+                else:
+                    curExpected, curDice, curPointers, curLayers = engine.step(previous)
+                solution.addTurn(curExpected, curDice, curPointers, history)
+                if self.incremental:
+                    layers.append(curLayers)
+                stats.addTurn(i, time.perf_counter()-start, mode)
+                if stats:
+                    stats.noteBytes('values', tableBytes(solution.expected)+tableBytes(layers))
+                    stats.noteBytes('policy', tableBytes(solution.dice)+tableBytes(solution.pointers))
+                if tolerance is not None and i < turns:
+                    curGains = tableDifference(curExpected, previous)
+                    if gains is not None and largestDifference(curGains, gains) <= tolerance and \
+                            tablesEqual(curDice, prevDice) and tablesEqual(curPointers, prevPointers):
+                        solution.extrapolate(turns, curGains)
+                        stats.count('turnsExtrapolated', turns-i)
+                        yield solution
+                        break
+                    gains = curGains
+                yield solution
+
+        finally:
+            engine.close()
+        if self.incremental:
+            self.__last = (keys, distributions, solution, layers)
+        if useCache:
+            with stats.phase('cache'):
+                self.cache.store(solution, tolerance)
+
+    #produces the best course of action from every space on the board for the given number of turns
+    #takes the same arguments as iterSolve
+    def solve(self, board, lineup, turns, index=None, history=True, dirty=None, keys=None, stats=None,
+              distributions=None, tolerance=None):
+        for solution in self.iterSolve(board, lineup, turns, index, history, dirty, keys, stats, distributions,
+                                       tolerance):
+            pass
+        return solution
+
+    #returns the last solution and best walk values arranged in the order of the given board along with
+    #the spaces to recompute on every turn, or None if the board must be solved from scratch
+    def __reusable(self, board, distributions, dirty, keys):
+        if self.__last is None or dirty is None:
+            return None
+        lastKeys, lastDistributions, solution, layers = self.__last
+        if lastDistributions != distributions:
+            return None
+        seeds = set(dirty)
+        if keys is not None and lastKeys is not None and list(keys) != list(lastKeys):
+            lastPositions = {key: pos for pos, key in enumerate(lastKeys)}
+            sources = [lastPositions.get(key, -1) for key in keys]
+            seeds.update(node for node, source in enumerate(sources) if source < 0)
+            solution = Solution(board, solution.lineup, distributions, remapTable(solution.expected, sources, 0),
+                                remapTable(solution.dice, sources, -1), remapTable(solution.pointers, sources, -1))
+            layers = remapTable(layers, sources, float("-inf"))
+        elif len(solution.expected[0]) != board.nodeCount:
+            return None
+        return solution, layers, seeds
+
+#produces the best course of action from every space on the board, one turn at a time,
+#without keeping any tables for later solves; see Solver.iterSolve
+def iterSolve(board, lineup, turns, index=None, backend=None, history=True, stats=None, distributions=None,
+              tolerance=None, cache=None):
+    return Solver(backend, incremental=False, cache=cache).iterSolve(board, lineup, turns, index, history, stats=stats,
+                                                        distributions=distributions, tolerance=tolerance)
+
+#produces the best course of action from every space on the board for the given number of turns
+#takes the same arguments as iterSolve
+def solve(board, lineup, turns, index=None, backend=None, history=True, stats=None, distributions=None,
+          tolerance=None, cache=None):
+    for solution in iterSolve(board, lineup, turns, index, backend, history, stats, distributions, tolerance,
+                              cache):
+        pass
+    return solution
+
+#Runs a solve on a background thread, which can be cancelled between turns
+#solutions is the generator returned by iterSolve or Solver.iterSolve, solving for the given number of turns
+#messages are posted to results as (kind, turns, payload) tuples: ('turn', i, description) after
+#each number of turns is solved, where description describes the best course of action from the
+#board's origin, then one of ('done', turns, solution), ('cancelled', i, None) or ('error', i, exception)
+#the board must not be changed while the solve runs, so callers should pass a fresh snapshot
+class BackgroundSolve:
+    def __init__(self, solutions, turns):
+        #the messages posted by the solve, to be polled by the caller
+        self.results = queue.Queue()
+        #the number of turns being solved for
+        self.turns = turns
+        self.__cancelled = threading.Event()
+        self.__solutions = solutions
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    #asks the solve to stop after the turn it is working on
+    def cancel(self):
+        self.__cancelled.set()
+
+    #whether the solve was asked to stop
+    @property
+    def cancelled(self):
+        return self.__cancelled.is_set()
+
+    def __run(self):
+        solution = None
+        try:
+            for solution in self.__solutions:
+                if self.__cancelled.is_set():
+                    self.results.put(('cancelled', solution.turns, None))
+                    return
+                origin = solution.board.origin
+                if solution.turns and origin is not None:
+                    self.results.put(('turn', solution.turns, solution.describe(origin)))
+            self.results.put(('done', solution.turns, solution))
+        except Exception as err:
+            self.results.put(('error', solution.turns if solution else 0, err))
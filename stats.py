@@ -0,0 +1,93 @@
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+#Collects operation counts, timings and table sizes from a solve, to show where its time goes
+#the solver only records into one when it is passed in; counters are grouped by name, phases
+#accumulate wall time across turns, and table sizes keep the largest size seen
+class SolveStats:
+    def __init__(self):
+        #the number of times each operation happened, by name
+        self.counters = {}
+        #the total wall time spent in each phase, in seconds
+        self.phases = {}
+        #how each turn was solved and how long it took, in the order the turns were solved
+        self.turns = []
+        #the largest size each kind of table reached, in bytes
+        self.peakBytes = {}
+
+    #adds to the count of an operation
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0)+amount
+
+    #times the enclosed block as part of the given phase
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0)+time.perf_counter()-start
+
+    #records the time taken by one turn, and whether it was solved in full, updated from the last
+    #solve's tables or reused from them unchanged
+    def addTurn(self, turn, seconds, mode):
+        self.turns.append({'turn': turn, 'seconds': seconds, 'mode': mode})
+
+    #records the current size of a kind of table, keeping the largest size seen
+    def noteBytes(self, kind, size):
+        self.peakBytes[kind] = max(self.peakBytes.get(kind, 0), size)
+
+    #the total wall time of every turn, in seconds
+    @property
+    def turnSeconds(self):
+        return sum(turn['seconds'] for turn in self.turns)
+
+    #produces the statistics as plain dicts and lists, ready to be written as JSON
+    def toDict(self):
+        return {'counters': dict(self.counters), 'phases': dict(self.phases), 'turns': list(self.turns),
+                'turnSeconds': self.turnSeconds, 'peakBytes': dict(self.peakBytes)}
+
+    #writes the statistics to a JSON file
+    def dump(self, path):
+        with open(path, 'w') as statsFile:
+            json.dump(self.toDict(), statsFile, indent=1)
+
+    #produces a short human readable summary of the statistics
+    def report(self):
+        lines = ["Solved " + str(len(self.turns)) + " turns in " + "{:.4f}".format(self.turnSeconds) + "s"]
+        if self.turns:
+            modes = {}
+            for turn in self.turns:
+                modes[turn['mode']] = modes.get(turn['mode'], 0)+1
+            slowest = max(self.turns, key=lambda turn: turn['seconds'])
+            lines.append("Turns: " + ", ".join(str(count) + " " + mode for mode, count in sorted(modes.items())) +
+                         "; slowest was turn " + str(slowest['turn']) + " at " +
+                         "{:.4f}".format(slowest['seconds']) + "s")
+        if self.phases:
+            lines.append("Phases: " + ", ".join(name + " " + "{:.4f}".format(seconds) + "s"
+                                                for name, seconds in sorted(self.phases.items())))
+        if self.counters:
+            lines.append("Counts: " + ", ".join(name + " " + str(amount)
+                                                for name, amount in sorted(self.counters.items())))
+        if self.peakBytes:
+            lines.append("Peak tables: " + ", ".join(kind + " " + "{:.1f}".format(size/1024) + "KiB"
+                                                     for kind, size in sorted(self.peakBytes.items())))
+        return "\n".join(lines)
+
+#Stands in for SolveStats when nothing is being recorded, ignoring everything it is given
+class NoStats(SolveStats):
+    def count(self, name, amount=1):
+        pass
+
+    def phase(self, name):
+        return nullcontext()
+
+    def addTurn(self, turn, seconds, mode):
+        pass
+
+    def noteBytes(self, kind, size):
+        pass
+
+    def __bool__(self):
+        return False
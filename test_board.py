@@ -0,0 +1,39 @@
+import pytest
+from benchmark import genBoard
+from board import Board, loadBoard, saveBoard
+
+#a board file with three spaces in a loop, the last of them a goal
+def boardDefinition(**fields):
+    definition = {'format': 'choosedice-board', 'version': 1,
+                  'nodes': [{'x': 0, 'y': 0, 'goal': False}, {'x': 40, 'y': 0, 'goal': False},
+                            {'x': 20, 'y': 40, 'goal': True}],
+                  'edges': [[0, 1], [1, 2], [2, 0]], 'origin': 0}
+    definition.update(fields)
+    return definition
+
+@pytest.mark.parametrize('shape', ['linear', 'grid', 'tree', 'mario'])
+def test_board_file_round_trip(tmp_path, shape):
+    board = genBoard(shape, 30, 3, 1)
+    path = str(tmp_path/'board.json')
+    saveBoard(board, path)
+    loaded = loadBoard(path)
+    assert loaded.nodeCount == board.nodeCount
+    assert list(loaded.xs) == list(board.xs) and list(loaded.ys) == list(board.ys)
+    assert loaded.goals == board.goals
+    assert loaded.origin == board.origin
+    assert loaded.offsets == board.offsets and loaded.targets == board.targets
+    assert loaded.labels == board.labels
+    assert loaded.toDict() == board.toDict()
+
+def test_board_from_dict():
+    board = Board.fromDict(boardDefinition())
+    assert board.nodeCount == 3
+    assert list(board.goals) == [0, 0, 1]
+    assert board.edges() == [(0, 1), (1, 2), (2, 0)]
+
+@pytest.mark.parametrize('fields', [{'format': 'something-else'}, {'version': 2}, {'edges': [[0, 3]]},
+                                    {'edges': [[-1, 0]]}, {'edges': [[1, 1]]}, {'edges': [[0, 1], [0, 1]]},
+                                    {'origin': 3}, {'origin': -1}])
+def test_invalid_board_rejected(fields):
+    with pytest.raises(ValueError):
+        Board.fromDict(boardDefinition(**fields))
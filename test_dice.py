@@ -0,0 +1,73 @@
+import itertools
+import json
+import pytest
+from dice import Character, convolve, defaultCharacters, dieHistogram, genDistributions, loadCharacters
+
+#the original distributions: an odometer counting every combination of the faces of the main die and
+#the allies' dice, behind a leading die whose second face only marks that every combination was counted
+def referenceDistributions(lineup):
+    out = []
+    for charInd, character in enumerate(lineup):
+        allies = lineup[charInd+1:]+lineup[:charInd]
+        dice = [[0,0]] + [character.mainDice] + [ally.allyDice for ally in allies]
+        maxRoll = 0
+        for d in dice:
+            maxRoll += d[-1]
+        curDist = [0]*(maxRoll+1)
+        indStack = [0]
+        curSum = 0
+        while indStack[0] == 0:
+            while len(indStack) < len(dice):
+                curSum += dice[len(indStack)][0]
+                indStack.append(0)
+            curDist[curSum] += 1
+            curSum -= dice[len(indStack) - 1][indStack[-1]]
+            indStack[-1] += 1
+            while indStack[-1] == len(dice[len(indStack) - 1]):
+                indStack.pop()
+                curSum -= dice[len(indStack) - 1][indStack[-1]]
+                indStack[-1] += 1
+            curSum += dice[len(indStack) - 1][indStack[-1]]
+        out.append(curDist)
+    return out
+
+@pytest.mark.parametrize('size', [1, 2, 3, 4])
+def test_distributions_match_odometer(size):
+    characters = defaultCharacters()
+    for lineup in itertools.islice(itertools.permutations(characters, size), 0, None, 97):
+        assert [list(dist) for dist in genDistributions(lineup)] == referenceDistributions(list(lineup))
+
+def test_convolve_sums_rolls():
+    first = (1, 0, 2)
+    second = (0, 3, 1, 1)
+    expected = [0]*(len(first)+len(second)-1)
+    for (roll, weight), (otherRoll, otherWeight) in itertools.product(enumerate(first), enumerate(second)):
+        expected[roll+otherRoll] += weight*otherWeight
+    assert convolve(first, second) == tuple(expected)
+    assert convolve((1,), second) == second
+
+def test_weighted_and_extra_dice():
+    character = Character('Doubled', {1: 1, 3: 2}, [1, 2], [[0, 2]])
+    assert character.mainHistogram == (0, 1, 0, 3, 0, 2)
+    assert character.allyHistogram == (0, 1, 1)
+
+def test_definition_round_trip(tmp_path):
+    characters = [Character('Plain', [0, 1, 3, 3, 5, 7], [1, 2]),
+                  Character('Weighted', {2: 1, 6: 3}, [1, 2], [[1, 2, 3]])]
+    path = tmp_path/'characters.json'
+    path.write_text(json.dumps([character.toDict() for character in characters]))
+    loaded = loadCharacters(str(path))
+    assert loaded == characters
+    assert [character.toDict() for character in loaded] == [character.toDict() for character in characters]
+
+@pytest.mark.parametrize('die', [[], [-1, 2, 3], [1.5], [True], {}, {-2: 1}, {1: -1, 6: 2}, {1: 0, 6: 0},
+                                 {1: 'heavy'}, {1: float('nan')}])
+def test_invalid_dice_rejected(die):
+    with pytest.raises(ValueError):
+        dieHistogram(die)
+
+@pytest.mark.parametrize('main', [{'faces': [1, 6], 'weights': [0, 0]}, {'faces': [1, 6], 'weights': [-1, 2]},
+                                  {'faces': [1, 6], 'weights': [1]}, {'faces': [1], 'weights': [1, 2]}])
+def test_invalid_definitions_rejected(main):
+    with pytest.raises(ValueError):
+        Character.fromDict({'name': 'Broken', 'main': main, 'ally': [1, 2]})
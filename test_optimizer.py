@@ -0,0 +1,39 @@
+from itertools import combinations
+import pytest
+from benchmark import genBoard
+from dice import defaultCharacters
+import optimizer
+
+#the candidates searched, few enough to solve every lineup of them
+candidates = defaultCharacters()[::2]
+
+#returns the names in each lineup of a ranking along with its expected goals
+def names(ranking):
+    return [(value, [character.name for character in lineup]) for value, lineup in ranking]
+
+#returns the ranking found by solving every lineup
+def exhaustiveRanking(board, size, turns, top):
+    optimizer.initWorker(board, candidates, size, turns, board.origin, None)
+    out = []
+    for _, out in optimizer.exhaustive(None, candidates, size, top, 4, None):
+        pass
+    return out
+
+@pytest.mark.parametrize('size', [1, 2, 3])
+@pytest.mark.parametrize('shape,seed', [('mario', 1), ('grid', 2)])
+def test_branch_and_bound_matches_exhaustive(shape, seed, size):
+    board = genBoard(shape, 40, 2, seed)
+    expected = exhaustiveRanking(board, size, 4, 3)
+    assert names(optimizer.optimizeLineup(board, candidates, size, 4, top=3, workers=1)) == names(expected)
+
+#the search must skip lineups for the comparison above to cover its pruning
+def test_branch_and_bound_prunes():
+    board = genBoard('mario', 40, 2, 1)
+    for evaluated, _ in optimizer.iterOptimize(board, candidates, 3, 4, top=1, workers=1):
+        pass
+    assert evaluated < len(candidates)+len(list(combinations(range(len(candidates)), 3)))
+
+def test_worker_pool_matches_one_process():
+    board = genBoard('mario', 40, 2, 3)
+    assert names(optimizer.optimizeLineup(board, candidates, 2, 4, top=3, workers=2)) == \
+        names(optimizer.optimizeLineup(board, candidates, 2, 4, top=3, workers=1))
@@ -0,0 +1,113 @@
+import http.client
+import json
+import threading
+import time
+import pytest
+from benchmark import genBoard
+import server
+import solver
+
+@pytest.fixture
+def service():
+    return server.SolveService(maxTurns=50)
+
+#a server answering on a free port of this machine, stopped once the test ends
+@pytest.fixture
+def address(service):
+    solveServer = server.SolveServer(service, port=0)
+    thread = threading.Thread(target=solveServer.serve_forever, daemon=True)
+    thread.start()
+    yield solveServer.server_address[:2]
+    solveServer.shutdown()
+    solveServer.server_close()
+
+#sends a request over a new connection, returning the status and the decoded JSON answer
+def request(address, method, path, body=None):
+    connection = http.client.HTTPConnection(*address, timeout=30)
+    try:
+        connection.request(method, path, json.dumps(body) if body is not None else None)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+def test_upload_and_solve(address):
+    board = genBoard('mario', 40, 2, 1)
+    status, answer = request(address, 'POST', '/boards', board.toDict())
+    assert status == 200
+    key = answer['board']
+    assert request(address, 'GET', '/boards/' + key) == (200, board.toDict())
+
+    expected = solver.solve(board, [character for character in server.defaultCharacters()
+                                    if character.name in ('Mario', 'Luigi')], 5)
+    status, answer = request(address, 'POST', '/solve', {'board': key, 'lineup': ['Luigi', 'Mario'], 'turns': 5})
+    assert status == 200
+    assert answer['expected'] == expected.getExpected(board.origin)
+    status, answer = request(address, 'GET', '/solve?board=' + key + '&lineup=Luigi,Mario&turns=3&origin=4')
+    assert status == 200
+    assert (answer['turns'], answer['origin']) == (3, 4)
+    assert answer['expected'] == expected.getExpected(4, 3)
+    assert request(address, 'GET', '/stats')[1] == {'answered': 1, 'solved': 1, 'coalesced': 0}
+
+@pytest.mark.parametrize('method,path,body,status', [
+    ('GET', '/boards/0123456789abcdef', None, 404),
+    ('GET', '/nowhere', None, 404),
+    ('POST', '/boards', {'format': 'not-a-board'}, 400),
+    ('POST', '/solve', {'lineup': ['Mario'], 'turns': 3}, 400),
+    ('POST', '/solve', {'board': 'missing', 'lineup': ['Mario'], 'turns': 3}, 404),
+    ('POST', '/solve', {'board': 'BOARD', 'lineup': ['Nobody'], 'turns': 3}, 400),
+    ('POST', '/solve', {'board': 'BOARD', 'lineup': ['Mario'], 'turns': 3.7}, 400),
+    ('POST', '/solve', {'board': 'BOARD', 'lineup': ['Mario'], 'turns': 51}, 400),
+    ('POST', '/solve', {'board': 'BOARD', 'lineup': ['Mario'], 'turns': 3, 'origin': 400}, 400),
+    ('GET', '/solve?board=BOARD&lineup=Mario&turns=3.7', None, 400),
+])
+def test_bad_requests(address, method, path, body, status):
+    key = request(address, 'POST', '/boards', genBoard('ring', 10, 2, 0).toDict())[1]['board']
+    if body is not None and body.get('board') == 'BOARD':
+        body = dict(body, board=key)
+    path = path.replace('BOARD', key)
+    answer = request(address, method, path, body)
+    assert answer[0] == status
+    assert 'error' in answer[1]
+
+def test_identical_requests_coalesce(address, service, monkeypatch):
+    #the solve waits until every request arrived, so that they all overlap it
+    release = threading.Event()
+    solve = solver.solve
+    def gatedSolve(*args, **kwargs):
+        release.wait(30)
+        return solve(*args, **kwargs)
+    monkeypatch.setattr(solver, 'solve', gatedSolve)
+
+    key = request(address, 'POST', '/boards', genBoard('mario', 40, 2, 2).toDict())[1]['board']
+    count = 6
+    answers = []
+    def ask():
+        answers.append(request(address, 'POST', '/solve', {'board': key, 'lineup': ['Mario'], 'turns': 10}))
+    threads = [threading.Thread(target=ask) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic()+30
+    while service.counters['solved']+service.counters['coalesced'] < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(30)
+    assert service.counters == {'answered': 0, 'solved': 1, 'coalesced': count-1}
+    assert len(answers) == count and all(answer == answers[0] for answer in answers)
+
+def test_solutions_bounded_by_size():
+    board = genBoard('mario', 40, 2, 3)
+    size = server.solutionBytes(solver.solve(board, server.defaultCharacters()[:1], 20))
+    service = server.SolveService(maxSolutionBytes=int(size*2.5))
+    for name in ['Boo', 'Bowser', 'Daisy', 'Wario']:
+        service.query(board.toDict(), [name], 20)
+        assert service.keptBytes <= service.maxSolutionBytes
+    assert service.keptBytes > 0
+    #the least recently used lineup was dropped and is solved again
+    service.query(board.toDict(), ['Boo'], 20)
+    assert service.counters['solved'] == 5
+    #a solution larger than the whole bound is answered without being kept
+    tiny = server.SolveService(maxSolutionBytes=size//2)
+    tiny.query(board.toDict(), ['Boo'], 20)
+    assert tiny.keptBytes == 0
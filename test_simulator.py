@@ -0,0 +1,23 @@
+import pytest
+from benchmark import genBoard, genLineup
+import simulator
+import solver
+
+pytestmark = pytest.mark.skipif(simulator.np is None, reason="NumPy is not installed")
+
+@pytest.mark.parametrize('shape,seed', [('mario', 1), ('grid', 2)])
+def test_simulated_mean_matches_expected(shape, seed):
+    board = genBoard(shape, 40, 2, seed)
+    solution = solver.solve(board, genLineup(2, seed), 8)
+    result = simulator.simulate(solution, 200000, seed=seed)
+    assert result.expected == solution.getExpected(board.origin)
+    assert abs(result.mean-result.expected) < 5*result.stdErr
+    assert result.games == 200000
+
+def test_workers_do_not_change_result():
+    board = genBoard('mario', 40, 2, 3)
+    solution = solver.solve(board, genLineup(2, 3), 8)
+    alone = simulator.simulate(solution, 50000, seed=7, workers=1, batchSize=8000)
+    shared = simulator.simulate(solution, 50000, seed=7, workers=2, batchSize=8000)
+    assert alone.counts.tolist() == shared.counts.tolist()
+    assert alone.mean == shared.mean
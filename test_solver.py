@@ -0,0 +1,214 @@
+import csv
+import pytest
+from benchmark import genBoard, genLineup
+from board import Board
+from cache import SolveCache
+from dice import genDistributions
+from stats import SolveStats
+import solver
+
+#the backends every solve is checked with, leaving out those that need NumPy without it
+backendNames = ['python']
+if solver.np is not None:
+    backendNames.extend(['numpy', 'parallel'])
+
+#every board is split across two workers, however small it is
+@pytest.fixture(autouse=True)
+def parallelShards(monkeypatch):
+    monkeypatch.setattr(solver.ParallelBackend, 'workers', 2)
+    monkeypatch.setattr(solver.ParallelBackend, 'minShardNodes', 4)
+
+#the seeded boards and lineup sizes solved by the tests, small enough for the reference search
+cases = [('linear', 12, 2, 1, 1), ('ring', 20, 2, 2, 2), ('grid', 16, 2, 3, 1), ('tree', 15, 2, 4, 2),
+         ('mario', 40, 2, 5, 2), ('mario', 60, 3, 6, 3)]
+
+#the original solver: a depth-first search through every walk of every roll from every space, returning
+#the expected goals, best character (or None) and direction choices for each roll of every turn
+def referenceSolve(board, lineup, turns):
+    distributions = genDistributions(lineup)
+    expected = [[1 if board.goals[node] else 0 for node in range(board.nodeCount)]]
+    dice = [[None]*board.nodeCount]
+    rollChoices = [[None]*board.nodeCount]
+    for i in range(1, turns+1):
+        curExpected = []
+        curDice = []
+        curChoices = []
+        for node in range(board.nodeCount):
+            maxExpected = 0
+            bestDice = None
+            bestRollChoices = None
+            for diceInd, dist in enumerate(distributions):
+                rollExpected = [float("-inf") for _ in dist]
+                choices = [() for _ in dist]
+                nodeStack = [(node, 0, ())]
+                while nodeStack:
+                    nextNode, distance, curPath = nodeStack.pop()
+                    candidate = expected[i-1][nextNode]
+                    if dist[distance] and candidate > rollExpected[distance]:
+                        rollExpected[distance] = candidate
+                        choices[distance] = curPath
+                    if distance != len(dist)-1:
+                        for edge in board.edgeRange(nextNode):
+                            newPath = curPath
+                            if board.labels[edge]:
+                                newPath += (board.labels[edge],)
+                            nodeStack.append((board.targets[edge], distance+1, newPath))
+                expectedValue = 0
+                totalDensity = 0
+                for ind, dens in enumerate(dist):
+                    safeExpected = rollExpected[ind]
+                    if safeExpected == float("-inf"):
+                        safeExpected = 0
+                    expectedValue += safeExpected * dens
+                    totalDensity += dens
+                expectedValue /= totalDensity
+                if expectedValue > maxExpected:
+                    maxExpected = expectedValue
+                    bestDice = diceInd
+                    bestRollChoices = choices
+            if board.goals[node]:
+                maxExpected += 1
+            curExpected.append(maxExpected)
+            curDice.append(bestDice)
+            curChoices.append(bestRollChoices)
+        expected.append(curExpected)
+        dice.append(curDice)
+        rollChoices.append(curChoices)
+    return expected, dice, rollChoices
+
+#asserts that a solution answers every space and number of turns exactly as the original solver did
+def assertMatchesReference(solution, reference):
+    expected, dice, rollChoices = reference
+    for turns in range(1, len(expected)):
+        for node in range(solution.board.nodeCount):
+            assert solution.getExpected(node, turns) == expected[turns][node]
+            assert solution.getDice(node, turns) == dice[turns][node]
+            choices = rollChoices[turns][node] or []
+            assert solution.getRollChoices(node, turns) == [(roll, path) for roll, path in enumerate(choices) if path]
+
+#asserts that two solutions hold the same tables for every number of turns
+def assertSameSolution(solution, other):
+    assert solution.turns == other.turns
+    for turns in range(1, solution.turns+1):
+        for node in range(solution.board.nodeCount):
+            assert solution.getExpected(node, turns) == other.getExpected(node, turns)
+            assert solution.getDice(node, turns) == other.getDice(node, turns)
+            assert solution.getRollChoices(node, turns) == other.getRollChoices(node, turns)
+
+#returns a copy of a board with the goal state of the given spaces toggled and the given edges added
+def editBoard(board, toggled=(), added=()):
+    goals = [node for node in range(board.nodeCount) if bool(board.goals[node]) != (node in toggled)]
+    coords = list(zip(board.xs, board.ys))
+    return Board(coords, board.edges()+list(added), goals, board.origin)
+
+@pytest.mark.parametrize('backend', backendNames)
+@pytest.mark.parametrize('shape,nodes,branching,seed,lineupSize', cases)
+def test_backends_match_reference(backend, shape, nodes, branching, seed, lineupSize):
+    board = genBoard(shape, nodes, branching, seed)
+    lineup = genLineup(lineupSize, seed)
+    solution = solver.solve(board, lineup, 4, backend=backend)
+    assertMatchesReference(solution, referenceSolve(board, lineup, 4))
+
+@pytest.mark.parametrize('backend', backendNames)
+def test_rolling_window_keeps_last_turn(backend):
+    board = genBoard('mario', 40, 2, 7)
+    lineup = genLineup(2, 7)
+    full = solver.solve(board, lineup, 6, backend=backend)
+    rolling = solver.solve(board, lineup, 6, backend=backend, history=False)
+    assert rolling.keptTurns == [6]
+    for node in range(board.nodeCount):
+        assert rolling.getExpected(node) == full.getExpected(node)
+        assert rolling.getDice(node) == full.getDice(node)
+        assert rolling.getRollChoices(node) == full.getRollChoices(node)
+
+@pytest.mark.parametrize('backend', backendNames)
+@pytest.mark.parametrize('shape,nodes,branching,seed,lineupSize', cases)
+def test_incremental_matches_full(backend, shape, nodes, branching, seed, lineupSize):
+    board = genBoard(shape, nodes, branching, seed)
+    lineup = genLineup(lineupSize, seed)
+    incremental = solver.Solver(backend)
+    incremental.solve(board, lineup, 5)
+    #a goal moves, then a shortcut is added, each re-solved from the last solve's tables
+    toggled = {1, board.nodeCount//2}
+    edited = editBoard(board, toggled)
+    assertSameSolution(incremental.solve(edited, lineup, 5, dirty=sorted(toggled)),
+                       solver.solve(edited, lineup, 5, backend=backend))
+    shortcut = (2, board.nodeCount-1)
+    if shortcut not in edited.edges():
+        edited = editBoard(edited, added=[shortcut])
+        assertSameSolution(incremental.solve(edited, lineup, 5, dirty=list(shortcut)),
+                           solver.solve(edited, lineup, 5, backend=backend))
+
+def test_incremental_requires_history():
+    board = genBoard('ring', 10, 2, 0)
+    with pytest.raises(ValueError):
+        solver.Solver('python').solve(board, genLineup(1, 0), 3, history=False)
+
+@pytest.mark.parametrize('backend', backendNames)
+@pytest.mark.parametrize('shape,seed', [('mario', 1), ('grid', 2), ('tree', 3)])
+def test_converged_solve_extrapolates(backend, shape, seed):
+    board = genBoard(shape, 40, 2, seed)
+    lineup = genLineup(2, seed)
+    exact = solver.solve(board, lineup, 200, backend=backend)
+    assert exact.steadyTurn is None
+    converged = solver.solve(board, lineup, 200, backend=backend, tolerance=1e-9)
+    assert converged.steadyTurn is not None and converged.solvedTurns < 200
+    assert converged.turns == 200
+    for node in range(board.nodeCount):
+        #before converging the solve is exact, and after it every turn is within the drift of the gains
+        assert converged.getExpected(node, converged.steadyTurn) == exact.getExpected(node, converged.steadyTurn)
+        assert converged.getExpected(node) == pytest.approx(exact.getExpected(node), rel=0, abs=1e-6)
+        assert converged.getDice(node) == exact.getDice(node)
+        assert converged.getRollChoices(node) == exact.getRollChoices(node)
+        assert converged.getGainRate(node) == pytest.approx(exact.getGainRate(node), rel=0, abs=1e-8)
+
+#returns the rows of a CSV export, keyed by number of turns and space
+def csvRows(path):
+    with open(path, newline='') as csvFile:
+        return {(int(row['turns']), int(row['space'])): row for row in csv.DictReader(csvFile)}
+
+@pytest.mark.parametrize('history,tolerance', [(True, None), (False, None), (True, 1e-9)])
+def test_csv_export(tmp_path, history, tolerance):
+    board = genBoard('mario', 40, 2, 8)
+    lineup = genLineup(2, 8)
+    solution = solver.solve(board, lineup, 120, history=history, tolerance=tolerance)
+    path = str(tmp_path/'results.csv')
+    solution.saveCsv(path)
+    rows = csvRows(path)
+    assert len(rows) == len(solution.keptTurns)*board.nodeCount
+    for turns in solution.keptTurns:
+        for node in range(board.nodeCount):
+            row = rows[(turns, node)]
+            assert float(row['expected']) == solution.getExpected(node, turns)
+            characterInd = solution.getDice(node, turns)
+            assert row['character'] == (lineup[characterInd].name if characterInd is not None else '')
+            assert row['choices'] == "; ".join(str(roll) + ": " + ", ".join(labels)
+                                               for roll, labels in solution.getRollChoices(node, turns))
+
+@pytest.mark.skipif(solver.np is None, reason="NumPy is not installed")
+@pytest.mark.parametrize('history,tolerance', [(True, None), (False, None), (True, 1e-9)])
+def test_array_export(tmp_path, history, tolerance):
+    board = genBoard('grid', 36, 2, 9)
+    lineup = genLineup(2, 9)
+    solution = solver.solve(board, lineup, 120, history=history, tolerance=tolerance)
+    path = str(tmp_path/'results.npz')
+    solution.saveArrays(path)
+    with solver.np.load(path) as arrays:
+        assert arrays['turns'].tolist() == solution.keptTurns
+        for row, turns in enumerate(solution.keptTurns):
+            assert arrays['expected'][row].tolist() == pytest.approx(solution.getValues(turns), rel=1e-12)
+            assert arrays['dice'][row].tolist() == [-1 if solution.getDice(node, turns) is None else
+                                                    solution.getDice(node, turns) for node in range(board.nodeCount)]
+        assert int(arrays['steadyTurn']) == (-1 if solution.steadyTurn is None else solution.steadyTurn)
+
+@pytest.mark.skipif(solver.np is None, reason="NumPy is not installed")
+@pytest.mark.parametrize('shape,nodes,branching,seed,lineupSize', cases)
+def test_cache_hit_matches_fresh_solve(tmp_path, shape, nodes, branching, seed, lineupSize):
+    board = genBoard(shape, nodes, branching, seed)
+    lineup = genLineup(lineupSize, seed)
+    cache = SolveCache(str(tmp_path))
+    solver.solve(board, lineup, 5, cache=cache)
+    stats = SolveStats()
+    loaded = solver.solve(board, lineup, 5, stats=stats, cache=cache)
+    assert stats.counters.get('solveCacheHits') == 1
+    assertSameSolution(loaded, solver.solve(board, lineup, 5))